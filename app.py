@@ -4,25 +4,33 @@ from utils.vocabulary_loader import VocabularyLoader
 from datetime import datetime
 import json
 import os
-from pathlib import Path
 import glob
+from config import Config, project_root, instance_path
 
 # ایجاد پوشه instance اگر وجود ندارد
-project_root = Path(__file__).parent
-instance_path = project_root / 'instance'
 instance_path.mkdir(exist_ok=True)
 
 app = Flask(__name__)
-app.config['SECRET_KEY'] = 'dev-key-123-change-in-production'
-app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{instance_path}/database.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SESSION_PERMANENT'] = False
-app.config['SESSION_TYPE'] = 'filesystem'
+app.config.from_object(Config)
 
 from models import db, User
+from utils.log import configure_logging
+from utils.sqlite_tuning import apply_sqlite_pragmas
+from utils.db_routing import READ_BIND, read_only
+
+configure_logging(app.config['LOG_LEVEL'], json_lines=app.config['LOG_JSON'])
 
 # Initialize extensions
 db.init_app(app)
+with app.app_context():
+    for bind_key, engine in db.engines.items():
+        pragmas = dict(app.config['SQLITE_PRAGMAS'])
+        if bind_key == READ_BIND:
+            # تغییر journal_mode روی اتصال فقط‌خواندنی (mode=ro) مجاز نیست
+            pragmas.pop('journal_mode', None)
+        apply_sqlite_pragmas(engine, pragmas)
+from utils.session_store import create_session_interface
+app.session_interface = create_session_interface(app)
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'auth.login'
@@ -47,13 +55,28 @@ def index():
 @app.route('/load_vocabulary')
 @login_required
 def load_vocabulary():
-    """بارگذاری کلمات از تمام فایل‌های JSON"""
+    """بارگذاری کلمات از تمام فایل‌های JSON
+
+    با ?mode=bulk کلمات به صورت گروهی (insert چندسطری) وارد می‌شوند و
+    با ?mode=parallel&workers=N فایل‌ها به صورت موازی تجزیه می‌شوند و
+    با ?mode=sync فقط فایل‌های تغییر کرده همگام‌سازی می‌شوند و
+    با ?mode=stream فایل‌های بزرگ (از جمله .jsonl) به صورت جریانی خوانده می‌شوند.
+    """
     loader = VocabularyLoader()
-    result = loader.load_all_files()
+    mode = request.args.get('mode')
+    if mode == 'sync':
+        result = loader.sync_all_files()
+    elif mode == 'stream':
+        result = loader.load_all_files(streaming=True)
+    elif mode == 'parallel':
+        result = loader.load_all_files(workers=request.args.get('workers', os.cpu_count(), type=int))
+    else:
+        result = loader.load_all_files(bulk=mode == 'bulk')
     return jsonify(result)
 
 @app.route('/vocabulary_stats')
 @login_required
+@read_only
 def vocabulary_stats():
     """دریافت آمار کلمات"""
     loader = VocabularyLoader()
@@ -70,6 +93,7 @@ def clear_vocabulary():
 
 @app.route('/check_vocabulary')
 @login_required
+@read_only
 def check_vocabulary():
     """بررسی وضعیت کلمات در دیتابیس"""
     from models import Word
@@ -86,8 +110,10 @@ def check_vocabulary():
 if __name__ == '__main__':
     with app.app_context():
         # Import all models
-        from models import Word, UserWord, ReviewSession, ReviewLog
-        db.create_all()
+        from models import Word, UserWord, ReviewSession, ReviewLog, VocabularyFile
+        from utils.schema import upgrade_schema
+        # ایجاد جداول و اعمال ستون‌ها و ایندکس‌های جدید روی دیتابیس موجود
+        upgrade_schema()
     
     # ایجاد پوشه templates اگر وجود ندارد
     templates_path = project_root / 'templates'
@@ -1,8 +1,50 @@
 import os
+from pathlib import Path
+from sqlalchemy.engine import make_url
+
+project_root = Path(__file__).parent
+instance_path = project_root / 'instance'
+
+def pool_options(url):
+    """اندازه استخر اتصال برای دیتابیس فایلی یا سرور؛ SQLite در حافظه استخر ثابت دارد و گزینه‌ای نمی‌گیرد"""
+    url = make_url(url)
+    if url.get_backend_name() == 'sqlite' and (
+            url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory'):
+        return {}
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE') or 10),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW') or 10),
+        'pool_timeout': 30,
+    }
+
+_database_url = os.environ.get('DATABASE_URL') or f'sqlite:///{instance_path}/database.db'
+_read_url = os.environ.get('DATABASE_READ_URL')
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-key-123-change-in-production'
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///instance/database.db'
+    # پروفایل PostgreSQL: DATABASE_URL=postgresql+psycopg2://... همراه با requirements-postgres.txt (COPY با psycopg2)
+    SQLALCHEMY_DATABASE_URI = _database_url
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # موتور فقط‌خواندنی اختیاری برای صفحات آماری (utils/db_routing.py)، مثلاً
+    # sqlite:///file:/path/snapshot.db?mode=ro&uri=true یا آدرس replica
+    SQLALCHEMY_BINDS = {'read': {'url': _read_url, **pool_options(_read_url)}} if _read_url else {}
+    # اندازه استخر اتصال (فقط برای دیتابیس فایلی یا سرور؛ SQLite در حافظه استخر ثابت دارد)
+    SQLALCHEMY_ENGINE_OPTIONS = pool_options(_database_url)
+    # روی هر اتصال جدید SQLite اجرا می‌شوند؛ WAL خواننده‌ها را پشت نویسنده معطل نمی‌کند
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE') or 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5000),
+        'cache_size': -20000,
+        'mmap_size': 256 * 1024 * 1024,
+    }
     SESSION_PERMANENT = False
-    SESSION_TYPE = 'filesystem'
\ No newline at end of file
+    # وضعیت جلسه در سمت سرور نگه داشته می‌شود: 'database' (جدول server_sessions،
+    # مشترک بین workerها) یا 'memory' (فقط تک‌پروسه‌ای)
+    SESSION_STORE = os.environ.get('SESSION_STORE') or 'database'
+    # تعداد پروسه‌های worker (همان متغیری که gunicorn می‌خواند)
+    WORKERS = int(os.environ.get('WEB_CONCURRENCY') or 1)
+    SESSION_TTL = 24 * 3600
+    # با LOG_LEVEL=DEBUG گزارش‌های دیباگ (مثل وضعیت کاربر در شروع جلسه) ساخته می‌شوند
+    LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'INFO'
+    LOG_JSON = os.environ.get('LOG_JSON') == '1'
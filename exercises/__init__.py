@@ -4,6 +4,7 @@
 import random
 from typing import List, Dict, Any
 from models import Word, UserWord
+from utils.vocabulary_catalog import vocabulary_catalog
 
 class ExerciseGenerator:
     """تولیدکننده تمرین‌های مختلف"""
@@ -91,51 +92,25 @@ class ExerciseGenerator:
     @staticmethod
     def _get_distractors(correct_word: Word, count: int, include_translation: bool = True) -> List[str]:
         """گزینه‌های انحرافی"""
-        from models import db
-        
-        # جستجوی کلمات هم‌خانواده
-        same_pos = Word.query.filter(
-            Word.part_of_speech == correct_word.part_of_speech,
-            Word.id != correct_word.id,
-            Word.cefr_level == correct_word.cefr_level
-        ).limit(20).all()
-        
-        distractors = []
-        if same_pos:
-            sample = random.sample(same_pos, min(count, len(same_pos)))
-            if include_translation:
-                distractors = [w.persian_translation for w in sample]
-            else:
-                distractors = [w.lemma for w in sample]
-        
-        # اگر کافی نبود، کلمات تصادفی اضافه کن
-        if len(distractors) < count:
-            all_words = Word.query.filter(Word.id != correct_word.id).limit(50).all()
-            extra = random.sample(all_words, min(count - len(distractors), len(all_words)))
-            if include_translation:
-                distractors.extend([w.persian_translation for w in extra])
-            else:
-                distractors.extend([w.lemma for w in extra])
-        
-        return distractors[:count]
+        # کلمات هم‌خانواده و اگر کافی نبود، کلمات تصادفی
+        catalog = vocabulary_catalog.get()
+        field = 'persian_translation' if include_translation else 'lemma'
+        sample = catalog.sample([
+            catalog.pool(correct_word.cefr_level, correct_word.part_of_speech),
+            catalog.all_words
+        ], count, correct_word.id, distinct=field, exclude_values=(getattr(correct_word, field),))
+        return [getattr(w, field) for w in sample]
     
     @staticmethod
     def _get_similar_words(word: Word, count: int) -> List[str]:
         """کلمات مشابه"""
         # در نسخه اولیه، کلمات هم‌سطح
-        similar = Word.query.filter(
-            Word.cefr_level == word.cefr_level,
-            Word.id != word.id,
-            Word.part_of_speech == word.part_of_speech
-        ).limit(count * 2).all()
-        
-        if len(similar) >= count:
-            selected = random.sample(similar, count)
-            return [w.lemma for w in selected]
-        
-        # اگر کافی نبود
-        all_words = Word.query.filter(Word.id != word.id).limit(50).all()
-        return [w.lemma for w in random.sample(all_words, min(count, len(all_words)))]
+        catalog = vocabulary_catalog.get()
+        sample = catalog.sample([
+            catalog.pool(word.cefr_level, word.part_of_speech),
+            catalog.all_words
+        ], count, word.id, distinct='lemma', exclude_values=(word.lemma,))
+        return [w.lemma for w in sample]
     
     @staticmethod
     def generate_for_word(word: Word, user_word: UserWord = None) -> Dict[str, Any]:
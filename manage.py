@@ -0,0 +1,270 @@
+# manage.py
+"""
+دستورات مدیریتی Solingo
+
+    python manage.py reschedule [--chunk-size N] [--resume]
+    python manage.py simulate [--users N] [--days M] [--replay] [--source DB]
+    python manage.py migrate
+    python manage.py check-indexes
+    python manage.py rebuild-stats [--user ID]
+    python manage.py build-exercises [--variants N]
+    python manage.py bench-contention [--writers N] [--readers N] [--duration S] [--think-ms MS] [--database-url URL]
+    python manage.py bench-answers [--checks N]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+def cmd_reschedule(args):
+    """بازمحاسبه memory_state و next_review تمام کلمات کاربران"""
+    from app import app, instance_path
+    from utils.reschedule import reschedule_user_words, read_checkpoint
+    
+    checkpoint_path = args.checkpoint or instance_path / 'reschedule.checkpoint'
+    start_after = read_checkpoint(checkpoint_path) if args.resume else 0
+    
+    print("=" * 60)
+    print(f"🔁 Rescheduling user_words (chunk={args.chunk_size}, start after id={start_after})")
+    print("=" * 60)
+    
+    with app.app_context():
+        result = reschedule_user_words(
+            chunk_size=args.chunk_size,
+            start_after=start_after,
+            checkpoint_path=checkpoint_path
+        )
+    
+    print("-" * 60)
+    print(f"✅ {result['processed']} rows processed, {result['updated']} updated "
+          f"in {result['elapsed']}s ({result['rows_per_sec']} rows/s)")
+    
+    # اجرای کامل شده؛ checkpoint دیگر لازم نیست
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    
+    # سطل‌های زمان مرور در user_stats با next_review جدید هماهنگ می‌شوند
+    from models import db
+    from utils.user_stats import rebuild_user_stats
+    with app.app_context():
+        users = rebuild_user_stats()
+        db.session.commit()
+    print(f"✅ user_stats rebuilt for {users} users")
+
+def cmd_simulate(args):
+    """شبیه‌سازی یا بازپخش مرورها روی کپی در حافظه دیتابیس"""
+    from utils.simulator import create_simulation_app, run_synthetic, run_replay, count_review_logs
+    
+    source = args.source
+    if args.replay and not source:
+        from app import instance_path
+        source = str(instance_path / 'database.db')
+    
+    app = create_simulation_app(source)
+    with app.app_context():
+        if args.replay:
+            if not count_review_logs():
+                print("❌ No review logs found to replay.")
+                return
+            report = run_replay(limit=args.limit)
+        else:
+            report = run_synthetic(
+                users=args.users,
+                days=args.days,
+                new_per_day=args.new_per_day,
+                session_size=args.session_size,
+                seed=args.seed
+            )
+    
+    print("=" * 60)
+    print(f"🧪 Simulation ({report['mode']})")
+    print("=" * 60)
+    print(f"  Reviews: {report['reviews']}")
+    print(f"  Scheduler: {report['scheduler_seconds']}s ({report['scheduler_reviews_per_sec']} reviews/s)")
+    print(f"  Wall time: {report['wall_seconds']}s")
+    print(f"  Queries: {report['queries']} ({report['queries_per_review']} per review)")
+    print(f"  Retention: {report['retention']}")
+    print("-" * 60)
+    print(f"  {'day':>4} {'due mean':>9} {'due max':>8} {'reviews':>8} {'retention':>10} {'queries':>8}")
+    for day in report['per_day']:
+        label = day['date'] or day['day']
+        print(f"  {label:>4} {day['due_mean']:>9} {day['due_max']:>8} {day['reviews']:>8} "
+              f"{str(day['retention']):>10} {day['queries']:>8}")
+
+def cmd_migrate(args):
+    """اعمال جداول، ستون‌ها و ایندکس‌های جدید روی دیتابیس موجود"""
+    from app import app
+    from utils.schema import upgrade_schema
+    
+    with app.app_context():
+        applied = upgrade_schema()
+    
+    if not applied:
+        print("✅ Database schema is up to date.")
+    for change in applied:
+        print(f"  ✅ {change}")
+
+def cmd_check_indexes(args):
+    """بررسی اینکه هیچ کوئری پرتکراری جدول را کامل پیمایش نکند"""
+    from app import app
+    from utils.schema import check_query_plans
+    
+    with app.app_context():
+        results = check_query_plans()
+    
+    failed = [result for result in results if result['full_scan']]
+    for result in results:
+        mark = '❌' if result['full_scan'] else '✅'
+        print(f"{mark} {result['name']}")
+        for detail in result['plan']:
+            print(f"     {detail}")
+    
+    print("-" * 60)
+    if failed:
+        print(f"❌ {len(failed)} of {len(results)} hot queries do a full table scan. Run: python manage.py migrate")
+        sys.exit(1)
+    print(f"✅ All {len(results)} hot queries use an index.")
+
+def cmd_rebuild_stats(args):
+    """محاسبه مجدد جدول user_stats از روی user_words و review_sessions"""
+    from app import app
+    from models import db
+    from utils.user_stats import rebuild_user_stats
+    
+    with app.app_context():
+        if args.user:
+            rebuild_user_stats(args.user)
+            db.session.commit()
+            print(f"✅ user_stats rebuilt for user {args.user}")
+        else:
+            users = rebuild_user_stats()
+            db.session.commit()
+            print(f"✅ user_stats rebuilt for {users} users")
+
+def cmd_build_exercises(args):
+    """ساخت دوباره بانک تمرین‌های از پیش ساخته شده"""
+    from app import app
+    from routes.learning import build_exercise
+    from utils.exercise_bank import build_exercise_bank
+    
+    print("=" * 60)
+    print(f"🧩 Building exercise bank ({args.variants} variants per exercise)")
+    print("=" * 60)
+    
+    with app.app_context():
+        result = build_exercise_bank(build_exercise, variants=args.variants, chunk_size=args.chunk_size)
+    
+    print("-" * 60)
+    print(f"✅ {result['exercises']} exercises for {result['words']} words "
+          f"in {result['elapsed']}s ({result['exercises_per_sec']} exercises/s)")
+
+def cmd_bench_contention(args):
+    """مقایسه تأخیر خواننده/نویسنده همزمان با تنظیمات پیش‌فرض SQLite، تنظیمات Config و (اختیاری) یک دیتابیس دیگر"""
+    from config import Config
+    from utils.sqlite_tuning import run_contention_benchmark
+    
+    profiles = [('default', {}, None), ('tuned', Config.SQLITE_PRAGMAS, None)]
+    if args.database_url:
+        profiles.append((args.profile_name, {}, args.database_url))
+    
+    print("=" * 60)
+    print(f"⏱️  Database contention: {args.writers} writer and {args.readers} reader processes, {args.duration}s per profile")
+    print("=" * 60)
+    print(f"  {'profile':<8} {'kind':<6} {'ops/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'errors':>7}")
+    
+    for name, pragmas, url in profiles:
+        report = run_contention_benchmark(
+            pragmas,
+            url=url,
+            writers=args.writers,
+            readers=args.readers,
+            duration=args.duration,
+            users=args.users,
+            words=args.words,
+            think_ms=args.think_ms,
+            seed=args.seed
+        )
+        for kind in ('read', 'write'):
+            row = report[kind]
+            print(f"  {name:<8} {kind:<6} {row['ops_per_sec']:>7} {str(row['p50_ms']):>8} {str(row['p95_ms']):>8} "
+                  f"{str(row['p99_ms']):>8} {str(row['max_ms']):>8} {row['errors']:>7}")
+        print(f"  {'':<8} {report.get('pragmas', report['dialect'])}")
+
+def cmd_bench_answers(args):
+    """سنجش زمان تطبیق پاسخ‌های تایپی روی واژگان فایل‌های data"""
+    from utils.answer_matching import benchmark_matching
+    from utils.vocabulary_loader import VocabularyLoader, parse_vocabulary_file
+    
+    entries = []
+    for path in sorted(VocabularyLoader().data_path.glob('*.json')):
+        _, rows, _ = parse_vocabulary_file(path)
+        entries.extend((values[0], values[1], values[2]) for values in rows)
+    
+    report = benchmark_matching(entries, checks=args.checks, seed=args.seed)
+    print("=" * 60)
+    print(f"🔤 Answer matching: {report['checks']} checks over {report['words']} words "
+          f"({report['accepted']} accepted)")
+    print("=" * 60)
+    print(f"  compiled (cold cache): {report['compiled_cold_us']} µs/check")
+    print(f"  compiled (warm cache): {report['compiled_warm_us']} µs/check")
+    print(f"  naive full Levenshtein: {report['naive_us']} µs/check")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Solingo management commands')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    reschedule = subparsers.add_parser('reschedule', help='recompute SRS state and next_review in bulk')
+    reschedule.add_argument('--chunk-size', type=int, default=5000)
+    reschedule.add_argument('--resume', action='store_true', help='continue after the last checkpointed id')
+    reschedule.add_argument('--checkpoint', help='checkpoint file (default: instance/reschedule.checkpoint)')
+    reschedule.set_defaults(func=cmd_reschedule)
+    
+    simulate = subparsers.add_parser('simulate', help='replay or simulate reviews against an in-memory copy')
+    simulate.add_argument('--users', type=int, default=20)
+    simulate.add_argument('--days', type=int, default=30)
+    simulate.add_argument('--new-per-day', type=int, default=5)
+    simulate.add_argument('--session-size', type=int, default=10)
+    simulate.add_argument('--seed', type=int, default=42)
+    simulate.add_argument('--replay', action='store_true', help='replay ReviewLog instead of synthetic users')
+    simulate.add_argument('--source', help='database file to copy (default for --replay: instance/database.db)')
+    simulate.add_argument('--limit', type=int, help='maximum number of review logs to replay')
+    simulate.set_defaults(func=cmd_simulate)
+    
+    migrate = subparsers.add_parser('migrate', help='create missing tables, columns and indexes')
+    migrate.set_defaults(func=cmd_migrate)
+    
+    check_indexes = subparsers.add_parser('check-indexes', help='fail if a hot query does a full table scan')
+    check_indexes.set_defaults(func=cmd_check_indexes)
+    
+    rebuild_stats = subparsers.add_parser('rebuild-stats', help='recompute the user_stats summary table')
+    rebuild_stats.add_argument('--user', type=int, help='only rebuild this user id')
+    rebuild_stats.set_defaults(func=cmd_rebuild_stats)
+    
+    build_exercises = subparsers.add_parser('build-exercises', help='precompute exercise payloads for every word')
+    build_exercises.add_argument('--variants', type=int, default=5, help='distractor variants per word and exercise type')
+    build_exercises.add_argument('--chunk-size', type=int, default=1000)
+    build_exercises.set_defaults(func=cmd_build_exercises)
+    
+    bench_contention = subparsers.add_parser('bench-contention', help='compare concurrent read/write latency with and without the SQLite pragmas')
+    bench_contention.add_argument('--writers', type=int, default=4)
+    bench_contention.add_argument('--readers', type=int, default=8)
+    bench_contention.add_argument('--duration', type=float, default=5.0, help='seconds per profile')
+    bench_contention.add_argument('--users', type=int, default=50)
+    bench_contention.add_argument('--words', type=int, default=2000)
+    bench_contention.add_argument('--think-ms', type=float, default=10, help='mean pause between operations of one client')
+    bench_contention.add_argument('--seed', type=int, default=42)
+    bench_contention.add_argument('--database-url', help='also run against this empty database (e.g. a throwaway PostgreSQL)')
+    bench_contention.add_argument('--profile-name', default='postgres', help='label for the --database-url profile')
+    bench_contention.set_defaults(func=cmd_bench_contention)
+    
+    bench_answers = subparsers.add_parser('bench-answers', help='time typed-answer matching against the vocabulary files')
+    bench_answers.add_argument('--checks', type=int, default=20000)
+    bench_answers.add_argument('--seed', type=int, default=42)
+    bench_answers.set_defaults(func=cmd_bench_answers)
+    
+    args = parser.parse_args(argv)
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
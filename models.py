@@ -2,8 +2,9 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from utils.db_routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -20,6 +21,8 @@ class User(UserMixin, db.Model):
     streak_days = db.Column(db.Integer, default=0)
     best_streak = db.Column(db.Integer, default=0)
     last_active_date = db.Column(db.DateTime, default=datetime.utcnow)
+    # مرز معرفی کلمات جدید: [level, lesson, frequency_rank, word_id] به صورت JSON
+    new_word_frontier = db.Column(db.Text)
     
     # Relationships
     user_words = db.relationship('UserWord', backref='user', lazy=True, cascade='all, delete-orphan')
@@ -57,7 +60,7 @@ class Word(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     lemma = db.Column(db.String(100), nullable=False)
-    article = db.Column(db.String(10))  # der, die, das
+    article = db.Column(db.String(10), default='')  # der, die, das یا '' (نه NULL؛ در قید یکتا NULLها متمایزند)
     plural = db.Column(db.String(100))  # جمع کلمه
     part_of_speech = db.Column(db.String(50))
     cefr_level = db.Column(db.String(10))
@@ -72,6 +75,14 @@ class Word(db.Model):
     # Relationships
     user_words = db.relationship('UserWord', backref='word', lazy=True, cascade='all, delete-orphan')
     
+    __table_args__ = (
+        # انتخاب کلمات جدید بر اساس سطح، درس و رتبه
+        db.Index('ix_words_level_lesson_rank', 'cefr_level', 'lesson', 'frequency_rank'),
+        # کلید یکتای ورودی واژگان (entry_key)؛ هدف ON CONFLICT در درج کلمات و
+        # با ستون اول lemma جستجوی وجود کلمه در بارگذاری واژگان
+        db.Index('uq_words_lemma_article', 'lemma', 'article', unique=True),
+    )
+    
     def __repr__(self):
         return f'<Word {self.article} {self.lemma}>'
     
@@ -108,9 +119,15 @@ class UserWord(db.Model):
     # نرخ فرسایش
     decay_rate = db.Column(db.Float, default=0.3)
     
-    __table_args__ = (db.UniqueConstraint('user_id', 'word_id', name='unique_user_word'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'word_id', name='unique_user_word'),
+        # شمارش و توزیع وضعیت‌ها برای هر کاربر
+        db.Index('ix_user_words_user_state', 'user_id', 'memory_state'),
+        # کلمات موعد مرور هر کاربر
+        db.Index('ix_user_words_user_next_review', 'user_id', 'next_review'),
+    )
     
-    def update_performance(self, is_correct, response_time):
+    def update_performance(self, is_correct, response_time, now=None):
         """بروزرسانی عملکرد کاربر برای این کلمه"""
         self.total_reviews += 1
         
@@ -126,7 +143,7 @@ class UserWord(db.Model):
         else:
             self.avg_response_time = (self.avg_response_time * (self.total_reviews - 1) + response_time) / self.total_reviews
         
-        self.last_reviewed = datetime.utcnow()
+        self.last_reviewed = now or datetime.utcnow()
 
 class ReviewSession(db.Model):
     __tablename__ = 'review_sessions'
@@ -143,6 +160,11 @@ class ReviewSession(db.Model):
     
     # Relationships
     review_logs = db.relationship('ReviewLog', backref='session', lazy=True, cascade='all, delete-orphan')
+    
+    __table_args__ = (
+        # جلسات اخیر هر کاربر
+        db.Index('ix_review_sessions_user_started', 'user_id', 'started_at'),
+    )
 
 class ReviewLog(db.Model):
     __tablename__ = 'review_logs'
@@ -157,4 +179,67 @@ class ReviewLog(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
-    user_word = db.relationship('UserWord', backref='review_logs')
\ No newline at end of file
+    user_word = db.relationship('UserWord', backref='review_logs')
+    
+    __table_args__ = (
+        db.Index('ix_review_logs_user_word', 'user_word_id'),
+    )
+
+class VocabularyFile(db.Model):
+    """مانیفست فایل‌های واژگان برای همگام‌سازی افزایشی"""
+    __tablename__ = 'vocabulary_files'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    path = db.Column(db.String(255), unique=True, nullable=False)
+    mtime = db.Column(db.Float)
+    size = db.Column(db.Integer)
+    content_hash = db.Column(db.String(64))
+    # کلیدهای (lemma, article) موجود در آخرین نسخه همگام‌شده فایل به صورت JSON
+    entry_keys = db.Column(db.Text, default='[]')
+    synced_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class UserStats(db.Model):
+    """خلاصه آمار هر کاربر که همزمان با ثبت پاسخ‌ها بروز می‌شود"""
+    __tablename__ = 'user_stats'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    
+    # تعداد کلمات در هر وضعیت حافظه
+    new_count = db.Column(db.Integer, default=0)
+    learning_count = db.Column(db.Integer, default=0)
+    weak_count = db.Column(db.Integer, default=0)
+    strong_count = db.Column(db.Integer, default=0)
+    mastered_count = db.Column(db.Integer, default=0)
+    
+    # مجموع‌های کل
+    total_sessions = db.Column(db.Integer, default=0)
+    total_questions = db.Column(db.Integer, default=0)
+    total_correct = db.Column(db.Integer, default=0)
+    words_learned = db.Column(db.Integer, default=0)
+    words_reviewed = db.Column(db.Integer, default=0)
+    
+    # تعداد کلمات غیر mastered بر اساس ساعت next_review به صورت JSON
+    due_buckets = db.Column(db.Text, default='{}')
+    # فعالیت روزانه (جلسه، کلمه، پاسخ صحیح، سوال) به صورت JSON
+    daily_activity = db.Column(db.Text, default='{}')
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ExerciseBank(db.Model):
+    """تمرین‌های از پیش ساخته شده برای هر کلمه و نوع تمرین"""
+    __tablename__ = 'exercise_bank'
+    
+    word_id = db.Column(db.Integer, db.ForeignKey('words.id'), primary_key=True)
+    exercise_type = db.Column(db.String(30), primary_key=True)
+    variant = db.Column(db.Integer, primary_key=True)
+    # خروجی آماده تمرین به صورت JSON فشرده
+    payload = db.Column(db.Text, nullable=False)
+
+class ServerSession(db.Model):
+    """وضعیت جلسه‌های Flask در سمت سرور (پشتیبان database در utils.session_store)"""
+    __tablename__ = 'server_sessions'
+    
+    key = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    # زمان انقضا به صورت timestamp یونیکس
+    expires_at = db.Column(db.Float, nullable=False, index=True)
@@ -2,269 +2,47 @@ from flask import Blueprint, render_template, request, jsonify, session
 from flask_login import login_required, current_user
 from exercises import ExerciseGenerator
 from datetime import datetime, timedelta
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload
+import math
 import random
 import time
-import math
 
 from models import db, User, Word, UserWord, ReviewSession, ReviewLog
+from spaced_repetition import SpacedRepetitionEngine
+from utils.due_queue import due_queues
+from utils.word_counters import word_counters
+from utils.db_routing import read_only
+from utils.upsert import insert_ignore
+from utils.answer_matching import match_answer
+from utils.log import get_logger, Lazy
+from utils.exercise_bank import get_banked_exercise, get_banked_exercises, pick_banked_exercise
+from utils.vocabulary_catalog import vocabulary_catalog
+from utils.user_stats import (
+    get_user_word_summary, get_user_stats, stats_summary, stats_recent_activity,
+    record_new_words, record_review, record_session
+)
 
 learning_bp = Blueprint('learning', __name__)
-
-# ===== Spaced Repetition Engine (مستقیم در این فایل) =====
-class SpacedRepetitionEngine:
-    """موتور تکرار فاصله‌دار"""
-    
-    BASE_INTERVALS = {
-        'new': 1,      # 1 ساعت
-        'learning': 6, # 6 ساعت
-        'weak': 12,    # 12 ساعت
-        'strong': 24,  # 1 روز
-        'mastered': 48 # 2 روز
-    }
-    
-    @staticmethod
-    def calculate_review(user_word, is_correct, response_time):
-        """محاسبه وضعیت بعدی بر اساس پاسخ کاربر"""
-        # به‌روزرسانی عملکرد
-        user_word.total_reviews += 1
-        
-        if is_correct:
-            user_word.correct_reviews += 1
-            user_word.consecutive_correct += 1
-            
-            # پاسخ سریع = قدرت بیشتر
-            if response_time < 4:
-                strength_increase = 0.25
-            elif response_time < 8:
-                strength_increase = 0.15
-            else:
-                strength_increase = 0.05
-                
-            # بونوس برای پاسخ‌های متوالی
-            if user_word.consecutive_correct > 3:
-                strength_increase += min(0.2, user_word.consecutive_correct * 0.03)
-                
-            user_word.memory_strength = min(1.0, user_word.memory_strength + strength_increase)
-        else:
-            user_word.consecutive_correct = 0
-            user_word.memory_strength = max(0.0, user_word.memory_strength - 0.4)
-        
-        # تعیین وضعیت جدید
-        if user_word.memory_strength >= 0.9:
-            new_state = 'mastered'
-        elif user_word.memory_strength >= 0.7:
-            new_state = 'strong'
-        elif user_word.memory_strength >= 0.5:
-            new_state = 'weak'
-        elif user_word.memory_strength >= 0.3:
-            new_state = 'learning'
-        else:
-            new_state = 'new'
-            
-        user_word.memory_state = new_state
-        
-        # محاسبه زمان مرور بعدی
-        base_hours = SpacedRepetitionEngine.BASE_INTERVALS.get(new_state, 1)
-        
-        if is_correct:
-            multiplier = 1.0 + (user_word.consecutive_correct * 0.5)
-            strength_multiplier = 1.0 + (user_word.memory_strength * 2.0)
-            total_multiplier = multiplier * strength_multiplier
-        else:
-            total_multiplier = 0.5
-        
-        # اعمال نرخ فرسایش
-        decay_factor = 1.5 - user_word.decay_rate
-        total_multiplier *= decay_factor
-        total_multiplier = max(0.5, min(total_multiplier, 10.0))
-        
-        interval_hours = base_hours * total_multiplier
-        
-        if interval_hours >= 24:
-            interval_days = math.ceil(interval_hours / 24)
-            next_review = datetime.utcnow() + timedelta(days=interval_days)
-        else:
-            next_review = datetime.utcnow() + timedelta(hours=interval_hours)
-        
-        user_word.next_review = next_review
-        user_word.last_reviewed = datetime.utcnow()
-        
-        # میانگین زمان پاسخ
-        if user_word.avg_response_time == 0:
-            user_word.avg_response_time = response_time
-        else:
-            user_word.avg_response_time = (user_word.avg_response_time * (user_word.total_reviews - 1) + response_time) / user_word.total_reviews
-        
-        return {
-            'next_review': next_review,
-            'strength': user_word.memory_strength,
-            'state': new_state,
-            'consecutive_correct': user_word.consecutive_correct
-        }
-    
-    @staticmethod
-    def get_due_words(user_id, limit=20):
-        """دریافت کلمات موعد مرور"""
-        due_words = UserWord.query.filter(
-            UserWord.user_id == user_id,
-            UserWord.next_review <= datetime.utcnow(),
-            UserWord.memory_state != 'mastered'
-        ).order_by(
-            UserWord.memory_strength.asc(),
-            UserWord.next_review.asc()
-        ).limit(limit).all()
-        
-        return due_words
-    
-    @staticmethod
-    def get_new_words(user_id, limit=5):
-        """دریافت کلمات جدید برای کاربر - نسخه بهبود یافته"""
-        from sqlalchemy import and_, not_
-        
-        # کاربر را پیدا کن
-        user = User.query.get(user_id)
-        if not user:
-            print(f"❌ کاربر {user_id} پیدا نشد")
-            return []
-        
-        user_level = user.current_level if user else 'A1'
-        
-        # **اولویت‌بندی برای کاربران جدید**: از پایه‌ای‌ترین درس شروع کن
-        print(f"🔍 جستجوی کلمات جدید برای کاربر {user_id} (سطح: {user_level})")
-        
-        # 1. ابتدا کلمات A1 درس ۴ (پایه‌ترین)
-        base_words = Word.query.filter(
-            and_(
-                Word.cefr_level == 'A1',
-                Word.lesson == '4',
-                not_(Word.id.in_(
-                    db.session.query(UserWord.word_id)
-                    .filter(UserWord.user_id == user_id)
-                    .subquery()
-                ))
-            )
-        ).order_by(
-            Word.frequency_rank.asc()
-        ).limit(limit).all()
-        
-        if base_words:
-            print(f"✅ {len(base_words)} کلمه از درس ۴ سطح A1 پیدا شد")
-            return base_words
-        
-        print("⚠️ کلمه‌ای در درس ۴ سطح A1 پیدا نشد")
-        
-        # 2. سپس سایر کلمات A1 بر اساس درس
-        a1_words = Word.query.filter(
-            and_(
-                Word.cefr_level == 'A1',
-                not_(Word.id.in_(
-                    db.session.query(UserWord.word_id)
-                    .filter(UserWord.user_id == user_id)
-                    .subquery()
-                ))
-            )
-        ).order_by(
-            Word.lesson.asc(),  # اول درس‌های پایین‌تر
-            Word.frequency_rank.asc()
-        ).limit(limit).all()
-        
-        if a1_words:
-            print(f"✅ {len(a1_words)} کلمه از سایر درس‌های A1 پیدا شد")
-            return a1_words
-        
-        print("⚠️ کلمه‌ای در سطح A1 پیدا نشد")
-        
-        # 3. اگر در سطح کاربر کلمه‌ای نبود، سطوح پایین‌تر را بررسی کن
-        if user_level != 'A1':
-            lower_level_words = Word.query.filter(
-                and_(
-                    Word.cefr_level == 'A1',
-                    not_(Word.id.in_(
-                        db.session.query(UserWord.word_id)
-                        .filter(UserWord.user_id == user_id)
-                        .subquery()
-                    ))
-                )
-            ).order_by(
-                Word.lesson.asc(),
-                Word.frequency_rank.asc()
-            ).limit(limit).all()
-            
-            if lower_level_words:
-                print(f"✅ {len(lower_level_words)} کلمه از سطح پایین‌تر (A1) پیدا شد")
-                return lower_level_words
-        
-        print("❌ هیچ کلمه جدیدی پیدا نشد")
-        return []
-    
-    @staticmethod
-    def should_introduce_new_words(user_id, due_count):
-        """تعیین آیا باید کلمات جدید معرفی شود یا نه"""
-        from models import UserWord
-        
-        # شمارش کلمات کاربر
-        total_user_words = UserWord.query.filter_by(user_id=user_id).count()
-        
-        # ========== **اصلاح بحرانی** ==========
-        # کاربر جدید → حتماً کلمه جدید معرفی کن
-        if total_user_words == 0:
-            print(f"👤 کاربر {user_id} جدید است. کلمات جدید معرفی می‌شود.")
-            return True
-        
-        # اگر کاربر کلمات زیادی برای مرور دارد، کلمات جدید اضافه نکن
-        if due_count >= 8:
-            print(f"⚠️ کاربر {user_id} کلمات زیادی برای مرور دارد ({due_count}). کلمات جدید اضافه نمی‌شود.")
-            return False
-        
-        # اگر کاربر کلمات جدید زیادی دارد (بیش از ۵ تا)، منتظر بمان
-        new_words_count = UserWord.query.filter_by(
-            user_id=user_id,
-            memory_state='new'
-        ).count()
-        
-        if new_words_count > 5:
-            print(f"⚠️ کاربر {user_id} کلمات جدید زیادی دارد ({new_words_count}). کلمات جدید اضافه نمی‌شود.")
-            return False
-        
-        # محاسبه نسبت کلمات تسلط یافته
-        mastered_count = UserWord.query.filter_by(
-            user_id=user_id,
-            memory_state='mastered'
-        ).count()
-        
-        if total_user_words > 0:
-            mastery_ratio = mastered_count / total_user_words
-            
-            # اگر کاربر کمتر از ۳۰٪ کلمات را تسلط یافته، کلمات جدید اضافه کن
-            if mastery_ratio < 0.3:
-                print(f"✅ کاربر {user_id} تسلط کم ({mastery_ratio:.0%}). کلمات جدید معرفی می‌شود.")
-                return True
-            else:
-                print(f"⚠️ کاربر {user_id} تسلط بالایی دارد ({mastery_ratio:.0%}). کلمات جدید اضافه نمی‌شود.")
-                return False
-        
-        # حالت پیش‌فرض: کلمات جدید معرفی کن
-        print(f"✅ حالت پیش‌فرض: کلمات جدید برای کاربر {user_id} معرفی می‌شود.")
-        return True
+log = get_logger('learning')
 
 # ===== Routes =====
 @learning_bp.route('/dashboard')
 @login_required
+@read_only
 def dashboard():
     """داشبورد کاربر"""
-    # آمار کاربر
-    total_words = UserWord.query.filter_by(user_id=current_user.id).count()
-    mastered_words = UserWord.query.filter_by(
-        user_id=current_user.id,
-        memory_state='mastered'
-    ).count()
+    # آمار کاربر، کلمات موعد مرور و توزیع وضعیت‌ها از جدول user_stats
+    summary = stats_summary(get_user_stats(current_user.id))
     
-    # کلمات برای مرور امروز
-    due_words_count = UserWord.query.filter(
-        UserWord.user_id == current_user.id,
-        UserWord.next_review <= datetime.utcnow(),
-        UserWord.memory_state != 'mastered'
-    ).count()
+    if request.args.get('json'):
+        return jsonify({
+            'total_words': summary['total'],
+            'mastered_words': summary['mastered'],
+            'due_words': summary['due'],
+            'due_soon': summary['due_soon'],
+            'status_distribution': summary['distribution']
+        })
     
     # آخرین سشن‌ها
     recent_sessions = ReviewSession.query.filter_by(
@@ -273,23 +51,13 @@ def dashboard():
         ReviewSession.started_at.desc()
     ).limit(5).all()
     
-    # توزیع وضعیت کلمات
-    status_distribution = {}
-    states = ['new', 'learning', 'weak', 'strong', 'mastered']
-    for state in states:
-        count = UserWord.query.filter_by(
-            user_id=current_user.id,
-            memory_state=state
-        ).count()
-        status_distribution[state] = count
-    
     return render_template('learning/dashboard.html',
                          user=current_user,
-                         total_words=total_words,
-                         mastered_words=mastered_words,
-                         due_words=due_words_count,
+                         total_words=summary['total'],
+                         mastered_words=summary['mastered'],
+                         due_words=summary['due'],
                          recent_sessions=recent_sessions,
-                         status_distribution=status_distribution)
+                         status_distribution=summary['distribution'])
 
 @learning_bp.route('/review')
 @login_required
@@ -308,22 +76,16 @@ def start_session():
 def api_start_session():
     """API to start a learning session - returns JSON"""
     try:
-        print(f"\n{'='*60}")
-        print(log_user_state(current_user.id))
-        print(f"{'='*60}\n")
-        print(f"\n🚀 Starting session for user {current_user.id} ({current_user.username})")
+        # گزارش وضعیت فقط وقتی سطح DEBUG فعال است ساخته می‌شود
+        log.debug('session.user_state', user_id=current_user.id, state=Lazy(log_user_state, current_user.id))
         
         # Get words for review
         due_words = SpacedRepetitionEngine.get_due_words(current_user.id, limit=10)
-        print(f"📝 Due words for review: {len(due_words)}")
         
         # Get new words
         new_words = []
         if SpacedRepetitionEngine.should_introduce_new_words(current_user.id, len(due_words)):
-            new_words = SpacedRepetitionEngine.get_new_words(current_user.id, limit=5)
-            print(f"🆕 New words found: {len(new_words)}")
-        else:
-            print(f"⏸️ No new words will be introduced")
+            new_words = SpacedRepetitionEngine.get_new_words(current_user.id, limit=5, advance_frontier=True)
         
         # ========== **Error Handling & State Validation** ==========
         # Detailed user status check
@@ -335,17 +97,14 @@ def api_start_session():
         # 2. Count current user's words
         total_user_words = UserWord.query.filter_by(user_id=current_user.id).count()
         
-        print(f"📊 User Statistics:")
-        print(f"   - Level: {user_level}")
-        print(f"   - Total available words: {total_words_in_level}")
-        print(f"   - User's word count: {total_user_words}")
-        print(f"   - Due words: {len(due_words)}")
-        print(f"   - New words found: {len(new_words)}")
+        log.debug('session.start', user_id=current_user.id, level=user_level,
+                  words_in_level=total_words_in_level, user_words=total_user_words,
+                  due=len(due_words), new=len(new_words))
         
         # Various Scenarios
         if total_user_words == 0 and len(new_words) == 0:
             # New user but no words found in database
-            print("❌ New User: No words found in database")
+            log.warning('session.no_words_in_database', user_id=current_user.id)
             return jsonify({
                 'success': False,
                 'message': 'No words available for learning! Please load vocabulary first.',
@@ -356,12 +115,13 @@ def api_start_session():
         
         elif total_user_words == 0 and len(new_words) > 0:
             # New user and words available - normal state
-            print(f"✅ New User: {len(new_words)} new words being introduced")
+            log.debug('session.new_user', user_id=current_user.id, new=len(new_words))
             # Continue normal flow
         
         elif total_user_words > 0 and total_user_words >= total_words_in_level:
             # User has mastered all available words in this level
-            print(f"🎉 User has mastered all {total_words_in_level} words in level {user_level}!")
+            log.info('session.level_completed', user_id=current_user.id, level=user_level,
+                     words_in_level=total_words_in_level)
             return jsonify({
                 'success': False,
                 'message': f'Well done! You have mastered all words in level {user_level}!',
@@ -372,15 +132,15 @@ def api_start_session():
         
         elif not due_words and not new_words:
             # Intermediate state - issue finding words
-            print("⚠️ Unusual state: No words for review and no new words found")
+            log.warning('session.no_due_or_new_words', user_id=current_user.id)
             
             # Fallback: Try finding new words with less restriction
-            fallback_new_words = SpacedRepetitionEngine.get_new_words(current_user.id, limit=10)
+            fallback_new_words = SpacedRepetitionEngine.get_new_words(current_user.id, limit=10, advance_frontier=True)
             if fallback_new_words:
-                print(f"🔄 Fallback mode: {len(fallback_new_words)} new words found")
+                log.info('session.fallback_new_words', user_id=current_user.id, new=len(fallback_new_words))
                 new_words = fallback_new_words
             else:
-                print("❌ Fallback mode failed to find words")
+                log.warning('session.fallback_failed', user_id=current_user.id)
                 return jsonify({
                     'success': False,
                     'message': 'The system could not find any words to learn. Please try again.',
@@ -398,42 +158,26 @@ def api_start_session():
             })
         
         # Create Review Session
+        user_stats = get_user_stats(current_user.id, for_update=True)
         review_session = ReviewSession(
             user_id=current_user.id,
             session_type='mixed',
             started_at=datetime.utcnow()
         )
         db.session.add(review_session)
+        record_session(user_stats, review_session.started_at)
         
         # Create UserWord records for new words and store IDs
-        new_user_word_ids = []
-        for word in new_words:
-            # Check if UserWord already exists
-            existing_user_word = UserWord.query.filter_by(
-                user_id=current_user.id,
-                word_id=word.id
-            ).first()
-            
-            if not existing_user_word:
-                user_word = UserWord(
-                    user_id=current_user.id,
-                    word_id=word.id,
-                    memory_state='new',
-                    next_review=datetime.utcnow()
-                )
-                db.session.add(user_word)
-                db.session.flush()  # Flush to get the ID
-                new_user_word_ids.append(user_word.id)
-            else:
-                new_user_word_ids.append(existing_user_word.id)
+        new_user_word_ids, created_user_words = _ensure_user_words(current_user.id, new_words)
+        record_new_words(user_stats, created_user_words)
+        
+        # Build session word list using the algorithm
+        # (پیش از commit تا وضعیت due_words دوباره از دیتابیس خوانده نشود)
+        all_user_word_ids = build_session_words(due_words, new_user_word_ids)
         
         # Commit changes
         db.session.commit()
         
-        # Build session word list using the algorithm
-        due_user_word_ids = [uw.id for uw in due_words]
-        all_user_word_ids = build_session_words(due_user_word_ids, new_user_word_ids)
-        
         if not all_user_word_ids:
             return jsonify({
                 'success': False,
@@ -447,6 +191,20 @@ def api_start_session():
         session['current_index'] = 0
         session['question_start_time'] = time.time()
         session['session_start_time'] = time.time()
+        session['bundled'] = False
+        
+        if request.args.get('bundle') in ('1', 'true'):
+            # کل جلسه یکجا ارسال می‌شود؛ پاسخ‌ها همچنان تک‌تک ثبت می‌شوند و
+            # فراخوانی بعدی /get_next_exercise جلسه را می‌بندد
+            session['current_index'] = len(all_user_word_ids)
+            session['bundled'] = True
+            return jsonify({
+                'success': True,
+                'session_id': review_session.id,
+                'total_words': len(all_user_word_ids),
+                'has_words': True,
+                'bundle': _build_session_bundle(all_user_word_ids)
+            })
         
         # Prepare the first word
         first_user_word_id = all_user_word_ids[0]
@@ -532,14 +290,21 @@ def get_next_exercise():
 @login_required
 def submit_answer():
     """ثبت پاسخ کاربر"""
-    data = request.json
-    user_word_id = data.get('user_word_id')
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not _is_id(data.get('user_word_id')):
+        return jsonify({'correct': False, 'error': 'درخواست نامعتبر'}), 400
+    user_word_id = data['user_word_id']
     answer = data.get('answer')
     exercise_type = data.get('exercise_type')
     
     # محاسبه زمان پاسخ - استفاده از زمان شروع سوال
     start_time = session.get('question_start_time', time.time())
     response_time = time.time() - start_time
+    if session.get('bundled'):
+        # در جلسه یکجا سرور زمان نمایش هر سوال را نمی‌داند
+        response_time = _parse_response_time(data.get('response_time'))
+        if response_time is None:
+            return jsonify({'correct': False, 'error': 'زمان پاسخ نامعتبر'}), 400
     
     # بررسی پاسخ
     user_word = UserWord.query.get(user_word_id)
@@ -549,24 +314,129 @@ def submit_answer():
             'error': 'کلمه یافت نشد'
         }), 404
     
-    word = user_word.word
-    is_correct = _check_answer(word, exercise_type, answer)
+    user_stats = get_user_stats(user_word.user_id, for_update=True)
+    review_session = ReviewSession.query.get(session.get('current_session_id'))
+    is_correct, result, log_row = _apply_answer(
+        user_word, exercise_type, answer, response_time, review_session, user_stats
+    )
+    db.session.add(ReviewLog(**log_row))
     
-    # بروزرسانی با موتور تکرار فاصله‌دار
-    result = SpacedRepetitionEngine.calculate_review(user_word, is_correct, response_time)
-    
-    # ثبت لاگ
-    review_log = ReviewLog(
-        session_id=session.get('current_session_id'),
-        user_word_id=user_word_id,
-        exercise_type=exercise_type,
-        response_time=response_time,
-        was_correct=is_correct
+    # محاسبه استریک
+    streak_info = calculate_streak_info(current_user.id, is_correct)
+    
+    db.session.commit()
+    
+    return jsonify({
+        'correct': is_correct,
+        'feedback': _answer_feedback(result, response_time),
+        'correct_answer': _get_correct_answer(user_word.word, exercise_type),
+        'streak': streak_info
+    })
+
+@learning_bp.route('/submit_answers', methods=['POST'])
+@login_required
+def submit_answers():
+    """ثبت گروهی پاسخ‌های یک جلسه در یک تراکنش
+    
+    ورودی: {'session_id': اختیاری, 'answers': [{'user_word_id', 'answer',
+    'exercise_type', 'response_time'}, ...]} به ترتیب پاسخ‌دهی
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'درخواست نامعتبر'}), 400
+    answers = data.get('answers') or []
+    # ورودی کلاینت پیش از هر دسترسی به دیتابیس (و قفل آمار) بررسی می‌شود
+    if not _valid_answers(answers):
+        return jsonify({'success': False, 'error': 'پاسخ‌های نامعتبر'}), 400
+    session_id = data.get('session_id') or session.get('current_session_id')
+    
+    review_session = ReviewSession.query.filter_by(id=session_id, user_id=current_user.id).first()
+    if not review_session:
+        return jsonify({'success': False, 'error': 'جلسه یافت نشد'}), 404
+    
+    user_word_ids = {answer['user_word_id'] for answer in answers}
+    user_words = {
+        user_word.id: user_word
+        for user_word in UserWord.query.options(joinedload(UserWord.word)).filter(
+            UserWord.id.in_(user_word_ids),
+            UserWord.user_id == current_user.id
+        )
+    }
+    
+    user_stats = get_user_stats(current_user.id, for_update=True)
+    now = datetime.utcnow()
+    results = []
+    log_rows = []
+    any_correct = False
+    
+    for answer in answers:
+        user_word = user_words.get(answer['user_word_id'])
+        if not user_word:
+            results.append({'user_word_id': answer['user_word_id'], 'error': 'کلمه یافت نشد'})
+            continue
+        
+        exercise_type = answer.get('exercise_type')
+        response_time = _parse_response_time(answer['response_time'])
+        is_correct, result, log_row = _apply_answer(
+            user_word, exercise_type, answer.get('answer'), response_time, review_session, user_stats, now
+        )
+        log_rows.append(log_row)
+        any_correct = any_correct or is_correct
+        results.append({
+            'user_word_id': user_word.id,
+            'correct': is_correct,
+            'feedback': _answer_feedback(result, response_time),
+            'correct_answer': _get_correct_answer(user_word.word, exercise_type)
+        })
+    
+    if log_rows:
+        db.session.execute(insert(ReviewLog), log_rows)
+    streak_info = calculate_streak_info(current_user.id, any_correct) if log_rows else None
+    
+    db.session.commit()
+    
+    return jsonify({
+        'success': True,
+        'submitted': len(log_rows),
+        'results': results,
+        'streak': streak_info
+    })
+
+def _is_id(value):
+    """شناسه عددی ارسالی کلاینت (bool در JSON عدد حساب نمی‌شود)"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def _parse_response_time(value):
+    """زمان پاسخ ارسالی کلاینت به ثانیه؛ None اگر عدد متناهی نباشد"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        return None
+    return max(0.0, float(value))
+
+def _valid_answers(answers):
+    """answers فهرستی از دیکشنری‌ها با user_word_id صحیح و response_time عددی متناهی است"""
+    if not isinstance(answers, list):
+        return False
+    return all(
+        isinstance(answer, dict)
+        and _is_id(answer.get('user_word_id'))
+        and _parse_response_time(answer.get('response_time')) is not None
+        for answer in answers
     )
-    db.session.add(review_log)
+
+def _apply_answer(user_word, exercise_type, answer, response_time, review_session, user_stats, now=None):
+    """بررسی پاسخ و اعمال آن روی UserWord، آمار کاربر و شمارنده‌های جلسه (بدون commit)
+    
+    خروجی: (is_correct, نتیجه calculate_review, مقادیر سطر ReviewLog)
+    """
+    now = now or datetime.utcnow()
+    is_correct = _check_answer(user_word.word, exercise_type, answer)
+    
+    # بروزرسانی با موتور تکرار فاصله‌دار
+    old_state, old_next_review = user_word.memory_state, user_word.next_review
+    result = SpacedRepetitionEngine.calculate_review(user_word, is_correct, response_time, now=now)
+    record_review(user_stats, old_state, old_next_review, user_word, is_correct, now)
     
     # بروزرسانی سشن
-    review_session = ReviewSession.query.get(session.get('current_session_id'))
     if review_session:
         review_session.total_questions += 1
         if is_correct:
@@ -577,80 +447,40 @@ def submit_answer():
         else:
             review_session.words_reviewed += 1
     
-    db.session.commit()
-    
-    # آماده کردن پاسخ صحیح برای نمایش
-    correct_answer = _get_correct_answer(word, exercise_type, answer)
-    
-    # محاسبه استریک
-    streak_info = calculate_streak_info(current_user.id, is_correct)
-    
-    return jsonify({
-        'correct': is_correct,
-        'feedback': {
-            'next_review': result['next_review'].strftime('%Y-%m-%d %H:%M'),
-            'strength': round(result['strength'] * 100),
-            'state': result['state'],
-            'consecutive_correct': result['consecutive_correct'],
-            'response_time': round(response_time, 2)
-        },
-        'correct_answer': correct_answer,
-        'streak': streak_info
-    })
+    log_row = {
+        'session_id': review_session.id if review_session else None,
+        'user_word_id': user_word.id,
+        'exercise_type': exercise_type,
+        'response_time': response_time,
+        'was_correct': is_correct,
+        'timestamp': now
+    }
+    return is_correct, result, log_row
+
+def _answer_feedback(result, response_time):
+    """بازخورد نمایشی نتیجه مرور"""
+    return {
+        'next_review': result['next_review'].strftime('%Y-%m-%d %H:%M'),
+        'strength': round(result['strength'] * 100),
+        'state': result['state'],
+        'consecutive_correct': result['consecutive_correct'],
+        'response_time': round(response_time, 2)
+    }
 
 
 @learning_bp.route('/session_stats')
 @login_required
+@read_only
 def session_stats():
     """آمار جلسات کاربر"""
-    from datetime import datetime, timedelta
-    
-    # جلسات ۷ روز اخیر
-    week_ago = datetime.utcnow() - timedelta(days=7)
-    recent_sessions = ReviewSession.query.filter(
-        ReviewSession.user_id == current_user.id,
-        ReviewSession.started_at >= week_ago
-    ).all()
-    
-    stats = {
-        'total_sessions': len(recent_sessions),
-        'total_words_learned': sum(s.words_learned for s in recent_sessions),
-        'total_words_reviewed': sum(s.words_reviewed for s in recent_sessions),
-        'accuracy': calculate_accuracy(recent_sessions),
-        'daily_activity': get_daily_activity(recent_sessions)
-    }
+    # آمار ۷ روز اخیر از جدول user_stats (یک جستجو با کلید اصلی)
+    stats = stats_recent_activity(get_user_stats(current_user.id), days=7)
     
     return jsonify(stats)
 
-def calculate_accuracy(sessions):
-    """محاسبه دقت کاربر"""
-    total_correct = sum(s.total_correct for s in sessions)
-    total_questions = sum(s.total_questions for s in sessions)
-    
-    if total_questions > 0:
-        return round((total_correct / total_questions) * 100, 1)
-    return 0
-
-def get_daily_activity(sessions):
-    """فعالیت روزانه کاربر"""
-    daily = {}
-    for session in sessions:
-        date = session.started_at.date().isoformat()
-        if date not in daily:
-            daily[date] = {
-                'sessions': 0,
-                'words': 0,
-                'accuracy': 0
-            }
-        daily[date]['sessions'] += 1
-        daily[date]['words'] += (session.words_learned + session.words_reviewed)
-        if session.total_questions > 0:
-            daily[date]['accuracy'] = round((session.total_correct / session.total_questions) * 100, 1)
-    
-    return daily
-
 @learning_bp.route('/get_weak_words')
 @login_required
+@read_only
 def get_weak_words():
     """دریافت کلمات ضعیف کاربر"""
     weak_words = UserWord.query.filter(
@@ -708,22 +538,14 @@ def word_introduction(word_id):
     """صفحه معرفی اولیه کلمه"""
     word = Word.query.get_or_404(word_id)
     
-    # بررسی آیا کاربر قبلاً این کلمه را دیده
-    user_word = UserWord.query.filter_by(
-        user_id=current_user.id,
-        word_id=word_id
-    ).first()
-    
-    if not user_word:
-        # ایجاد رکورد اولیه
-        user_word = UserWord(
-            user_id=current_user.id,
-            word_id=word_id,
-            memory_state='new',
-            next_review=datetime.utcnow()
-        )
-        db.session.add(user_word)
-        db.session.commit()
+    # ایجاد رکورد اولیه اگر کاربر قبلاً این کلمه را ندیده
+    # (آمار پیش از درج قفل و خوانده می‌شود تا بازسازی آن کلمه تازه را دو بار نشمارد)
+    user_stats = get_user_stats(current_user.id, for_update=True)
+    (user_word_id,), created = _ensure_user_words(current_user.id, [word])
+    if created:
+        record_new_words(user_stats, created)
+    db.session.commit()
+    user_word = db.session.get(UserWord, user_word_id)
     
     return render_template('learning/introduction.html', word=word, user_word=user_word)
 
@@ -732,12 +554,14 @@ def word_introduction(word_id):
 def start_learning_from_intro(word_id):
     """شروع یادگیری کلمه بعد از معرفی"""
     # ایجاد سشن برای این کلمه
+    user_stats = get_user_stats(current_user.id, for_update=True)
     review_session = ReviewSession(
         user_id=current_user.id,
         session_type='introduction',
         started_at=datetime.utcnow()
     )
     db.session.add(review_session)
+    record_session(user_stats, review_session.started_at)
     db.session.commit()
     
     # ذخیره در سشن
@@ -806,6 +630,7 @@ def smart_start():
 
 @learning_bp.route('/get_next_lesson')
 @login_required
+@read_only
 def get_next_lesson():
     """پیشنهاد درس بعدی برای یادگیری"""
     # بررسی کلمات یاد گرفته شده در هر درس
@@ -898,12 +723,14 @@ def api_start_practice_session():
             })
     
     # ایجاد سشن
+    user_stats = get_user_stats(current_user.id, for_update=True)
     review_session = ReviewSession(
         user_id=current_user.id,
         session_type='practice',
         started_at=datetime.utcnow()
     )
     db.session.add(review_session)
+    record_session(user_stats, review_session.started_at)
     db.session.commit()
     
     # ذخیره در سشن
@@ -944,27 +771,20 @@ def debug_user_state():
     }
     
     # آمار کلمات
+    summary = get_user_word_summary(user_id)
     words_info = {
         'total_words_in_level': Word.query.filter_by(cefr_level=current_user.current_level or 'A1').count(),
-        'user_words_total': UserWord.query.filter_by(user_id=user_id).count(),
-        'due_words': len(SpacedRepetitionEngine.get_due_words(user_id)),
+        'user_words_total': summary['total'],
+        'due_words': summary['due'],
         'should_introduce_new': SpacedRepetitionEngine.should_introduce_new_words(user_id, 0),
         'new_words_available': len(SpacedRepetitionEngine.get_new_words(user_id, limit=10))
     }
     
-    # توزیع وضعیت
-    states_dist = {}
-    for state in ['new', 'learning', 'weak', 'strong', 'mastered']:
-        states_dist[state] = UserWord.query.filter_by(
-            user_id=user_id,
-            memory_state=state
-        ).count()
-    
     return render_template('learning/debug_state.html',
                          user_info=user_info,
                          words_info=words_info,
-                         states_dist=states_dist,
-                         log=log_user_state(user_id))
+                         states_dist=summary['distribution'],
+                         log=log_user_state(user_id, summary))
 
 # ===== توابع کمکی =====
 def _prepare_word_data(user_word):
@@ -987,23 +807,85 @@ def _prepare_word_data(user_word):
         'lesson': word.lesson
     }
 
+def _ensure_user_words(user_id, words):
+    """UserWord کلمات داده‌شده برای کاربر؛ موارد موجود نبود یکجا ایجاد می‌شوند
+    
+    خروجی: (شناسه‌ها به ترتیب words، UserWordهای تازه ایجادشده)
+    """
+    word_ids = [word.id for word in words]
+    if not word_ids:
+        return [], []
+    
+    # ON CONFLICT DO NOTHING: ردیف‌های موجود (یا ساخته‌شده همزمان) برگردانده نمی‌شوند
+    now = datetime.utcnow()
+    created = db.session.scalars(
+        insert_ignore(UserWord, ('user_id', 'word_id')).returning(UserWord),
+        [
+            {'user_id': user_id, 'word_id': word_id, 'memory_state': 'new', 'next_review': now}
+            for word_id in dict.fromkeys(word_ids)
+        ]
+    ).all()
+    existing = {user_word.word_id: user_word.id for user_word in created}
+    
+    missing = [word_id for word_id in word_ids if word_id not in existing]
+    if missing:
+        existing.update(db.session.query(UserWord.word_id, UserWord.id).filter(
+            UserWord.user_id == user_id,
+            UserWord.word_id.in_(missing)
+        ))
+    
+    for user_word in created:
+        due_queues.update(user_word)
+    word_counters.record_created(user_id, count=len(created))
+    
+    return [existing[word_id] for word_id in word_ids], created
+
+def _build_session_bundle(user_word_ids):
+    """داده کلمه و تمرین همه سوالات جلسه با دو کوئری"""
+    user_words = UserWord.query.options(
+        joinedload(UserWord.word)
+    ).filter(UserWord.id.in_(user_word_ids)).all()
+    by_id = {user_word.id: user_word for user_word in user_words}
+    
+    planned = []
+    for user_word_id in user_word_ids:
+        user_word = by_id.get(user_word_id)
+        if user_word:
+            planned.append((user_word, _choose_exercise_type(user_word)))
+    
+    banked = get_banked_exercises((user_word.word_id, exercise_type) for user_word, exercise_type in planned)
+    
+    return [{
+        'exercise': _create_exercise_by_type(user_word, exercise_type, banked),
+        'word_data': _prepare_word_data(user_word),
+        'user_word_id': user_word.id,
+        'position': position
+    } for position, (user_word, exercise_type) in enumerate(planned, 1)]
+
 def _generate_exercise(user_word):
     """تولید تمرین بر اساس وضعیت کلمه"""
     return ExerciseGenerator.generate_for_word(user_word.word, user_word)
 
-def _get_multiple_choice_options(correct_word, count=4):
-    """گزینه‌های چندگانه با گزینه انحرافی"""
+def _get_multiple_choice_options(correct_word, count=4, include_translation=True):
+    """گزینه‌های چندگانه با گزینه انحرافی
+    
+    با include_translation=False فقط lemma گزینه‌های انحرافی برگردانده می‌شود
+    و افزودن گزینه صحیح با فراخواننده است.
+    """
+    catalog = vocabulary_catalog.get()
+    if not include_translation:
+        distractors = catalog.sample([catalog.pool(correct_word.cefr_level)], count - 1, correct_word.id,
+                                     distinct='lemma', exclude_values=(correct_word.lemma,))
+        return [word.lemma for word in distractors]
+    
+    distractors = catalog.sample([catalog.pool(correct_word.cefr_level)], count - 1, correct_word.id,
+                                 exclude_values=(correct_word.persian_translation,))
+    
     # گزینه صحیح
     options = [correct_word.persian_translation]
     
     # گزینه‌های انحرافی
-    all_words = Word.query.filter(
-        Word.id != correct_word.id,
-        Word.cefr_level == correct_word.cefr_level
-    ).limit(50).all()
-    
-    if len(all_words) >= count - 1:
-        distractors = random.sample(all_words, count - 1)
+    if len(distractors) >= count - 1:
         options.extend([word.persian_translation for word in distractors])
     else:
         # اگر کلمات کافی نبود، گزینه‌های عمومی اضافه کن
@@ -1015,33 +897,23 @@ def _get_multiple_choice_options(correct_word, count=4):
 
 def _get_random_word_except(exclude_id):
     """یک کلمه تصادفی غیر از کلمه داده‌شده"""
-    words = Word.query.filter(Word.id != exclude_id).limit(50).all()
-    return random.choice(words) if words else None
+    return vocabulary_catalog.get().random_word(exclude_id)
 
 def _check_answer(word, exercise_type, user_answer):
     """بررسی صحت پاسخ برای انواع تمرین"""
     if exercise_type == 'multiple_choice':
         return user_answer == word.persian_translation
     
-    elif exercise_type == 'typing':
-        # تطبیق انعطاف‌پذیر برای تایپینگ
-        correct = word.lemma.lower().strip()
-        user = user_answer.lower().strip()
-        
-        # حذف فاصله‌های اضافی
-        correct = ' '.join(correct.split())
-        user = ' '.join(user.split())
-        
-        # تطبیق جزئی
-        return correct == user
+    elif exercise_type in ('typing', 'listening'):
+        # تطبیق با صورت‌های نرمال‌شده کلمه (umlaut/ß، حرف تعریف، جمع) با تحمل غلط تایپی؛
+        # پاسخی که خودش کلمه دیگری از واژگان است غلط تایپی حساب نمی‌شود
+        return match_answer(word, user_answer, vocabulary_catalog.get().folded_lemmas).correct
     
     elif exercise_type == 'article_choice':
         return user_answer == word.article
     
     elif exercise_type == 'sentence_completion':
-        return user_answer.lower() == word.lemma.lower()
-    
-    elif exercise_type == 'listening':
+        # گزینه‌ها lemmaهای دیگر هستند، پس تطبیق دقیق
         return user_answer.lower() == word.lemma.lower()
     
     elif exercise_type == 'recognition':
@@ -1064,22 +936,26 @@ def _get_correct_answer(word, exercise_type):
     else:
         return ''
     
-def build_session_words(due_user_word_ids, new_user_word_ids):
-    """ساخت جلسه با الگوریتم مناسب"""
+def build_session_words(due_user_words, new_user_word_ids):
+    """ساخت جلسه با الگوریتم مناسب
+    
+    due_user_words همان UserWordهای بارگذاری‌شده get_due_words هستند و
+    برای خواندن memory_state کوئری دیگری لازم نیست.
+    """
+    due_user_word_ids = [user_word.id for user_word in due_user_words]
+    
     # اولویت: کلمات ضعیف اولویت اول
     weak_user_words = []
     learning_user_words = []
     other_due_user_words = []
     
-    for uw_id in due_user_word_ids:
-        user_word = UserWord.query.get(uw_id)
-        if user_word:
-            if user_word.memory_state == 'weak':
-                weak_user_words.append(uw_id)
-            elif user_word.memory_state == 'learning':
-                learning_user_words.append(uw_id)
-            else:
-                other_due_user_words.append(uw_id)
+    for user_word in due_user_words:
+        if user_word.memory_state == 'weak':
+            weak_user_words.append(user_word.id)
+        elif user_word.memory_state == 'learning':
+            learning_user_words.append(user_word.id)
+        else:
+            other_due_user_words.append(user_word.id)
     
     # ترکیب جلسه با نسبت‌های مناسب
     session_user_word_ids = []
@@ -1113,6 +989,10 @@ def build_session_words(due_user_word_ids, new_user_word_ids):
 
 def _generate_exercise_based_on_state(user_word):
     """تولید تمرین بر اساس وضعیت حافظه کاربر"""
+    return _create_exercise_by_type(user_word, _choose_exercise_type(user_word))
+
+def _choose_exercise_type(user_word):
+    """انتخاب نوع تمرین بر اساس وضعیت حافظه کاربر"""
     memory_state = user_word.memory_state
     consecutive_correct = user_word.consecutive_correct
     avg_response_time = user_word.avg_response_time
@@ -1150,16 +1030,27 @@ def _generate_exercise_based_on_state(user_word):
     
     # انتخاب نوع تمرین با در نظر گرفتن وزن‌ها
     import random
-    exercise_type = random.choices(exercise_types, weights=weights, k=1)[0]
-    
-    # تولید تمرین
-    return _create_exercise_by_type(user_word, exercise_type)
+    return random.choices(exercise_types, weights=weights, k=1)[0]
 
-def _create_exercise_by_type(user_word, exercise_type):
-    """ایجاد تمرین بر اساس نوع"""
-    word = user_word.word
-    word_data = _prepare_word_data(user_word)
+def _create_exercise_by_type(user_word, exercise_type, banked=None):
+    """ایجاد تمرین بر اساس نوع؛ در صورت وجود از بانک تمرین برداشته می‌شود
     
+    banked نتیجه از پیش خوانده‌شده get_banked_exercises برای ساخت گروهی است.
+    """
+    if banked is None:
+        exercise = get_banked_exercise(user_word.word_id, exercise_type)
+    else:
+        exercise = pick_banked_exercise(banked, user_word.word_id, exercise_type)
+    if exercise is None:
+        exercise = build_exercise(user_word.word, exercise_type)
+    
+    # سختی تمرین تایپ به وضعیت حافظه کاربر بستگی دارد
+    if exercise['type'] == 'typing':
+        exercise['difficulty'] = 'hard' if user_word.memory_state in ['strong', 'mastered'] else 'medium'
+    return exercise
+
+def build_exercise(word, exercise_type):
+    """ساخت خروجی یک تمرین برای کلمه (بدون وابستگی به وضعیت کاربر)"""
     if exercise_type == 'multiple_choice':
         options = _get_multiple_choice_options(word)
         return {
@@ -1175,7 +1066,7 @@ def _create_exercise_by_type(user_word, exercise_type):
             'type': 'typing',
             'question': f"ترجمه آلمانی '{word.persian_translation}' را بنویسید:",
             'hint': word.part_of_speech,
-            'difficulty': 'hard' if user_word.memory_state in ['strong', 'mastered'] else 'medium'
+            'difficulty': 'medium'
         }
     
     elif exercise_type == 'article_choice':
@@ -1242,7 +1133,7 @@ def _create_exercise_by_type(user_word, exercise_type):
             }
         else:
             # اگر مثالی ندارد، تمرین تایپینگ بده
-            return _create_exercise_by_type(user_word, 'typing')
+            return build_exercise(word, 'typing')
     
     elif exercise_type == 'reverse_translation':
         options = _get_multiple_choice_options(word, include_translation=False)
@@ -1258,10 +1149,10 @@ def _create_exercise_by_type(user_word, exercise_type):
         }
     
     # حالت پیش‌فرض
-    return _create_exercise_by_type(user_word, 'multiple_choice')
+    return build_exercise(word, 'multiple_choice')
 
 def calculate_streak_info(user_id, is_correct):
-    """محاسبه اطلاعات استریک کاربر"""
+    """محاسبه اطلاعات استریک کاربر (commit با فراخواننده است)"""
     from datetime import datetime, timedelta
     
     user = User.query.get(user_id)
@@ -1296,8 +1187,6 @@ def calculate_streak_info(user_id, is_correct):
     if user.streak_days > user.best_streak:
         user.best_streak = user.streak_days
     
-    db.session.commit()
-    
     return {
         'current': user.streak_days,
         'best': user.best_streak
@@ -1305,59 +1194,39 @@ def calculate_streak_info(user_id, is_correct):
 
 def _get_similar_words(word, count=3):
     """کلمات مشابه برای distractors"""
-    # جستجوی کلمات هم‌خانواده در همان درس و سطح
-    similar_words = Word.query.filter(
-        Word.id != word.id,
-        Word.cefr_level == word.cefr_level,
-        Word.part_of_speech == word.part_of_speech
-    ).limit(20).all()
-    
-    if len(similar_words) >= count:
-        import random
-        selected = random.sample(similar_words, count)
-        return [w.lemma for w in selected]
-    
-    # اگر کافی نبود، کلمات هم‌سطح
-    same_level = Word.query.filter(
-        Word.id != word.id,
-        Word.cefr_level == word.cefr_level
-    ).limit(50).all()
-    
-    if same_level:
-        import random
-        selected = random.sample(same_level, min(count, len(same_level)))
+    # کلمات هم‌نقش در همان سطح، و در صورت کمبود کلمات هم‌سطح
+    catalog = vocabulary_catalog.get()
+    selected = catalog.sample([
+        catalog.pool(word.cefr_level, word.part_of_speech),
+        catalog.pool(word.cefr_level)
+    ], count, word.id, distinct='lemma', exclude_values=(word.lemma,))
+    
+    if selected:
         return [w.lemma for w in selected]
     
     # حالت پیش‌فرض
     return ['Haus', 'Buch', 'Stadt'][:count]
 
-def log_user_state(user_id):
+def log_user_state(user_id, summary=None):
     """لاگ وضعیت کاربر برای دیباگ"""
-    from models import UserWord, Word
-    
     user = User.query.get(user_id)
     if not user:
         return "کاربر پیدا نشد"
     
-    user_words = UserWord.query.filter_by(user_id=user_id).all()
+    summary = summary or get_user_word_summary(user_id)
     total_words = Word.query.filter_by(cefr_level=user.current_level or 'A1').count()
     
     log = f"""
 📋 وضعیت کاربر {user.username} (ID: {user_id}):
 ├─ سطح فعلی: {user.current_level}
 ├─ کل کلمات موجود: {total_words}
-├─ کلمات کاربر: {len(user_words)}
+├─ کلمات کاربر: {summary['total']}
 ├─ توزیع وضعیت:
 """
     
-    states = ['new', 'learning', 'weak', 'strong', 'mastered']
-    for state in states:
-        count = UserWord.query.filter_by(
-            user_id=user_id,
-            memory_state=state
-        ).count()
+    for state, count in summary['distribution'].items():
         log += f"│  ├─ {state}: {count}\n"
     
-    log += f"└─ کلمات موعد مرور: {len(SpacedRepetitionEngine.get_due_words(user_id))}"
+    log += f"└─ کلمات موعد مرور: {summary['due']}"
     
-    return log
\ No newline at end of file
+    return log
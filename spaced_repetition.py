@@ -1,6 +1,30 @@
+import json
 import math
 from datetime import datetime, timedelta
-import random
+
+from sqlalchemy import and_, or_, func
+from models import db, User, Word, UserWord
+from utils.due_queue import due_queues
+from utils.word_counters import word_counters
+from utils.log import get_logger
+
+log = get_logger('srs')
+
+# ترتیب وضعیت‌ها از ضعیف‌ترین به قوی‌ترین؛ اندیس‌های خروجی review_batch به این ترتیب هستند
+STATES = ('new', 'learning', 'weak', 'strong', 'mastered')
+
+CEFR_LEVELS = ('A1', 'A2', 'B1', 'B2', 'C1', 'C2')
+
+# ردیف‌های اضافه هر دسته پیمایش مرز برای کلمات معرفی‌شده پس از مرز
+FRONTIER_SCAN_SLACK = 16
+
+def _lesson_order(lesson):
+    """کلید مرتب‌سازی درس‌ها: شماره‌ها به ترتیب عددی، سپس بقیه، و None در آخر"""
+    if lesson is None:
+        return (2, 0, '')
+    if lesson.isdigit():
+        return (0, int(lesson), lesson)
+    return (1, 0, lesson)
 
 class SpacedRepetitionEngine:
     """موتور تکرار فاصله‌دار"""
@@ -23,54 +47,139 @@ class SpacedRepetitionEngine:
     }
     
     @classmethod
-    def calculate_review(cls, user_word, is_correct, response_time):
+    def calculate_review(cls, user_word, is_correct, response_time, now=None):
         """
         محاسبه وضعیت بعدی بر اساس پاسخ کاربر
         """
+        now = now or datetime.utcnow()
+        old_state = user_word.memory_state
+        
+        strength, consecutive_correct, new_state, _ = cls.review_step(
+            user_word.memory_strength,
+            user_word.consecutive_correct,
+            user_word.decay_rate,
+            response_time,
+            is_correct
+        )
+        
         # به‌روزرسانی عملکرد
-        user_word.update_performance(is_correct, response_time)
+        user_word.update_performance(is_correct, response_time, now)
+        
+        user_word.memory_strength = strength
+        user_word.memory_state = new_state
+        
+        # محاسبه زمان مرور بعدی
+        next_review = cls._calculate_next_review(user_word, new_state, is_correct, now)
+        user_word.next_review = next_review
+        due_queues.update(user_word)
+        if user_word.user_id is not None:
+            word_counters.record_transition(user_word.user_id, old_state, new_state)
         
-        # محاسبه قدرت حافظه جدید
+        return {
+            'next_review': next_review,
+            'strength': strength,
+            'state': new_state,
+            'consecutive_correct': consecutive_correct
+        }
+    
+    @classmethod
+    def review_step(cls, strength, consecutive_correct, decay_rate, response_time, is_correct):
+        """
+        هسته خالص الگوریتم برای یک مرور (بدون ORM)
+        خروجی: (قدرت جدید، پاسخ‌های صحیح متوالی، وضعیت جدید، فاصله به ساعت با
+        گرد کردن روزانه، یعنی همان فاصله‌ای که زمان‌بندی می‌شود)
+        """
         if is_correct:
-            # پاسخ صحیح
-            time_factor = max(0, 1 - (response_time / 15))  # جریمه برای پاسخ‌های آهسته
+            consecutive_correct += 1
             
+            # پاسخ سریع = قدرت بیشتر
             if response_time < 4:
-                # پاسخ سریع (کمتر از 4 ثانیه)
-                strength_increase = 0.25 + (0.1 * time_factor)
+                strength_increase = 0.25
             elif response_time < 8:
-                # پاسخ متوسط
-                strength_increase = 0.15 + (0.05 * time_factor)
+                strength_increase = 0.15
             else:
-                # پاسخ کند
-                strength_increase = 0.05 + (0.02 * time_factor)
+                strength_increase = 0.05
             
-            # بونوس برای پاسخ‌های متوالی صحیح
-            if user_word.consecutive_correct > 3:
-                consecutive_bonus = min(0.2, user_word.consecutive_correct * 0.03)
-                strength_increase += consecutive_bonus
-            
-            user_word.memory_strength = min(1.0, user_word.memory_strength + strength_increase)
+            # بونوس برای پاسخ‌های متوالی
+            if consecutive_correct > 3:
+                strength_increase += min(0.2, consecutive_correct * 0.03)
             
+            strength = min(1.0, strength + strength_increase)
         else:
-            # پاسخ غلط - کاهش شدید
-            penalty = 0.4 - (response_time / 50)  # پاسخ‌های سریع‌تر جریمه کمتری
-            user_word.memory_strength = max(0.0, user_word.memory_strength - penalty)
+            consecutive_correct = 0
+            strength = max(0.0, strength - 0.4)
         
-        # تعیین وضعیت جدید
-        new_state = cls._determine_state(user_word.memory_strength)
-        user_word.memory_state = new_state
+        state = cls._determine_state(strength)
+        interval_hours = cls._round_interval(
+            cls._interval_hours(state, consecutive_correct, strength, decay_rate, is_correct)
+        )
         
-        # محاسبه زمان مرور بعدی
-        next_review = cls._calculate_next_review(user_word, new_state, is_correct)
-        user_word.next_review = next_review
+        return strength, consecutive_correct, state, interval_hours
+    
+    @classmethod
+    def review_batch(cls, strength, consecutive_correct, decay_rate, response_time, is_correct):
+        """
+        نسخه برداری review_step روی آرایه‌های NumPy
         
-        return {
-            'next_review': next_review,
-            'strength': user_word.memory_strength,
-            'state': new_state,
-            'consecutive_correct': user_word.consecutive_correct
-        }
+        نتایج دقیقاً برابر با review_step است. وضعیت‌ها به صورت اندیس در
+        STATES برگردانده می‌شوند و فاصله‌ها به ساعت (با گرد کردن روزانه
+        _round_interval) هستند.
+        خروجی: (قدرت، پاسخ‌های صحیح متوالی، اندیس وضعیت، فاصله به ساعت)
+        """
+        import numpy as np
+        
+        strength = np.asarray(strength, dtype=np.float64)
+        consecutive_correct = np.asarray(consecutive_correct, dtype=np.int64)
+        decay_rate = np.asarray(decay_rate, dtype=np.float64)
+        response_time = np.asarray(response_time, dtype=np.float64)
+        is_correct = np.asarray(is_correct, dtype=bool)
+        
+        consecutive_correct = np.where(is_correct, consecutive_correct + 1, 0)
+        
+        strength_increase = np.where(response_time < 4, 0.25, np.where(response_time < 8, 0.15, 0.05))
+        strength_increase = np.where(
+            consecutive_correct > 3,
+            strength_increase + np.minimum(0.2, consecutive_correct * 0.03),
+            strength_increase
+        )
+        strength = np.where(
+            is_correct,
+            np.minimum(1.0, strength + strength_increase),
+            np.maximum(0.0, strength - 0.4)
+        )
+        
+        state_index, interval_hours = cls.schedule_batch(strength, consecutive_correct, decay_rate, is_correct)
+        
+        return strength, consecutive_correct, state_index, interval_hours
+    
+    @classmethod
+    def schedule_batch(cls, strength, consecutive_correct, decay_rate, is_correct):
+        """
+        وضعیت و فاصله مرور برای مقادیر پس از مرور (بدون اعمال پاسخ جدید)
+        خروجی: (اندیس وضعیت در STATES، فاصله به ساعت با گرد کردن روزانه)
+        """
+        import numpy as np
+        
+        strength = np.asarray(strength, dtype=np.float64)
+        consecutive_correct = np.asarray(consecutive_correct, dtype=np.int64)
+        decay_rate = np.asarray(decay_rate, dtype=np.float64)
+        is_correct = np.asarray(is_correct, dtype=bool)
+        
+        thresholds = np.array([cls.STRENGTH_THRESHOLDS[state] for state in STATES[1:]])
+        state_index = np.searchsorted(thresholds, strength, side='right')
+        
+        base_hours = np.array([cls.BASE_INTERVALS.get(state, 1) for state in STATES], dtype=np.float64)
+        total_multiplier = np.where(
+            is_correct,
+            (1.0 + consecutive_correct * 0.5) * (1.0 + strength * 2.0),
+            0.5
+        )
+        total_multiplier = total_multiplier * (1.5 - decay_rate)
+        total_multiplier = np.maximum(0.5, np.minimum(total_multiplier, 10.0))
+        interval_hours = base_hours[state_index] * total_multiplier
+        interval_hours = np.where(interval_hours >= 24, np.ceil(interval_hours / 24) * 24, interval_hours)
+        
+        return state_index, interval_hours
     
     @classmethod
     def _determine_state(cls, strength):
@@ -87,76 +196,303 @@ class SpacedRepetitionEngine:
             return 'new'
     
     @classmethod
-    def _calculate_next_review(cls, user_word, state, is_correct):
+    def _calculate_next_review(cls, user_word, state, is_correct, now=None):
         """محاسبه زمان مرور بعدی"""
+        interval_hours = cls._interval_hours(
+            state,
+            user_word.consecutive_correct,
+            user_word.memory_strength,
+            user_word.decay_rate,
+            is_correct
+        )
+        return (now or datetime.utcnow()) + cls._interval_delta(interval_hours)
+    
+    @classmethod
+    def _interval_hours(cls, state, consecutive_correct, strength, decay_rate, is_correct):
+        """فاصله مرور بعدی به ساعت"""
         base_hours = cls.BASE_INTERVALS.get(state, 1)
         
         # ضرب‌کننده بر اساس عملکرد
         if is_correct:
             # ضرب‌کننده تصاعدی برای پاسخ‌های متوالی صحیح
-            multiplier = 1.0 + (user_word.consecutive_correct * 0.5)
+            multiplier = 1.0 + (consecutive_correct * 0.5)
             
             # ضرب‌کننده بر اساس قدرت حافظه
-            strength_multiplier = 1.0 + (user_word.memory_strength * 2.0)
+            strength_multiplier = 1.0 + (strength * 2.0)
             
             total_multiplier = multiplier * strength_multiplier
-            
+        
         else:
             # برای پاسخ غلط، مرور زودتر
             total_multiplier = 0.5
         
         # اعمال نرخ فرسایش
-        decay_factor = 1.5 - user_word.decay_rate  # 1.0 تا 1.5
+        decay_factor = 1.5 - decay_rate  # 1.0 تا 1.5
         total_multiplier *= decay_factor
         
         # محدود کردن بازه
         total_multiplier = max(0.5, min(total_multiplier, 10.0))
         
-        interval_hours = base_hours * total_multiplier
-        
-        # تبدیل به روز اگر بزرگ‌تر از 24 ساعت است
+        return base_hours * total_multiplier
+    
+    @staticmethod
+    def _round_interval(interval_hours):
+        """گرد کردن فاصله به روز کامل وقتی حداقل 24 ساعت است"""
         if interval_hours >= 24:
-            interval_days = math.ceil(interval_hours / 24)
-            next_review = datetime.utcnow() + timedelta(days=interval_days)
-        else:
-            next_review = datetime.utcnow() + timedelta(hours=interval_hours)
-        
-        return next_review
+            return math.ceil(interval_hours / 24) * 24
+        return interval_hours
     
     @classmethod
-    def get_due_words(cls, user_id, limit=20):
-        """دریافت کلمات موعد مرور"""
-        from models import UserWord
-        from datetime import datetime
+    def _interval_delta(cls, interval_hours):
+        """تبدیل فاصله به timedelta (به روز اگر بزرگ‌تر از 24 ساعت است)"""
+        return timedelta(hours=cls._round_interval(interval_hours))
+    
+    @staticmethod
+    def get_due_words(user_id, limit=20, now=None):
+        """دریافت کلمات موعد مرور
+        
+        انتخاب از صف heap درون‌پروسه‌ای کاربر انجام می‌شود (به ترتیب
+        next_review و سپس قدرت حافظه) و فقط ردیف‌های انتخاب‌شده با کلید
+        اصلی از دیتابیس خوانده می‌شوند. صف ممکن است از دیتابیس عقب باشد
+        (مرور در پروسه دیگر یا تراکنش برگشت‌خورده)، پس ردیف‌های خوانده‌شده
+        دوباره بر اساس موعد و وضعیت فیلتر و ورودی‌های کهنه در صف اصلاح می‌شوند.
+        """
+        now = now or datetime.utcnow()
+        queue = due_queues.get(user_id, SpacedRepetitionEngine._load_due_entries)
         
-        due_words = UserWord.query.filter(
+        due_words = []
+        checked = set()
+        while len(due_words) < limit:
+            user_word_ids = [
+                uw_id for uw_id in queue.pop_due(now, limit + len(checked))
+                if uw_id not in checked
+            ][:limit - len(due_words)]
+            if not user_word_ids:
+                break
+            checked.update(user_word_ids)
+            
+            user_words = {uw.id: uw for uw in UserWord.query.filter(UserWord.id.in_(user_word_ids))}
+            for uw_id in user_word_ids:
+                user_word = user_words.get(uw_id)
+                if user_word is None or user_word.user_id != user_id:
+                    queue.remove(uw_id)
+                elif user_word.memory_state == 'mastered' or user_word.next_review > now:
+                    due_queues.update(user_word)
+                else:
+                    due_words.append(user_word)
+        return due_words
+    
+    @staticmethod
+    def _load_due_entries(user_id):
+        """ورودی‌های صف موعد مرور کاربر: (id، next_review، قدرت حافظه)"""
+        return db.session.query(
+            UserWord.id,
+            UserWord.next_review,
+            UserWord.memory_strength
+        ).filter(
             UserWord.user_id == user_id,
-            UserWord.next_review <= datetime.utcnow(),
             UserWord.memory_state != 'mastered'
-        ).order_by(
-            UserWord.memory_strength.asc(),  # اول کلمات ضعیف
-            UserWord.next_review.asc()
-        ).limit(limit).all()
+        ).all()
+    
+    @staticmethod
+    def get_new_words(user_id, limit=5, advance_frontier=False):
+        """دریافت کلمات جدید برای کاربر از مرز یادگیری (frontier) او
         
-        return due_words
+        کلمات به ترتیب (سطح، درس، frequency_rank، id) معرفی می‌شوند؛ سطوح از A1
+        تا سطح کاربر و درس‌ها به ترتیب عددی. مرز کاربر اولین کلمه‌ای است که
+        ممکن است هنوز معرفی نشده باشد، پس هر فراخوانی فقط از همان نقطه روی
+        ایندکس ix_words_level_lesson_rank پیمایش می‌کند و کلمات معرفی‌شده را با
+        LEFT JOIN روی user_words کنار می‌گذارد. فقط با advance_frontier=True
+        (مسیری که کلمات را واقعاً معرفی می‌کند) مرز تا اولین کلمه معرفی‌نشده
+        جلو می‌رود؛ فراخوانی‌های دیگر چیزی نمی‌نویسند.
+        """
+        user = db.session.get(User, user_id)
+        if not user:
+            log.warning('new_words.user_not_found', user_id=user_id)
+            return []
+        
+        levels = SpacedRepetitionEngine._frontier_levels(user.current_level)
+        frontier = SpacedRepetitionEngine._load_frontier(user, levels)
+        log.debug('new_words.search', user_id=user_id, level=user.current_level, frontier=frontier)
+        
+        words = []
+        new_frontier = None
+        last_key = None
+        start_level = levels.index(frontier[0]) if frontier else 0
+        
+        for level in levels[start_level:]:
+            lessons = SpacedRepetitionEngine._lessons(level)
+            if frontier and level == frontier[0]:
+                lessons = [lesson for lesson in lessons if _lesson_order(lesson) >= _lesson_order(frontier[1])]
+            
+            for lesson in lessons:
+                start = frontier[2:] if frontier and (level, lesson) == tuple(frontier[:2]) else None
+                for word, known in SpacedRepetitionEngine._scan_lesson(user_id, level, lesson, start, limit - len(words)):
+                    last_key = [level, lesson, word.frequency_rank, word.id]
+                    if known:
+                        continue
+                    if new_frontier is None:
+                        new_frontier = last_key
+                    words.append(word)
+                    if len(words) >= limit:
+                        break
+                if len(words) >= limit:
+                    break
+            if len(words) >= limit:
+                break
+        
+        if new_frontier is None and last_key is not None:
+            # همه کلمات پس از مرز معرفی شده‌اند؛ مرز به بعد از آخرین کلمه می‌رود
+            new_frontier = last_key[:3] + [last_key[3] + 1]
+        if advance_frontier and new_frontier is not None and new_frontier != frontier:
+            user.new_word_frontier = json.dumps(new_frontier, ensure_ascii=False)
+        
+        if len(words) < limit:
+            # کلمات پیش از مرز که هنوز معرفی نشده‌اند (مثلاً واژگان تازه بارگذاری‌شده)
+            gaps = SpacedRepetitionEngine._gap_words(user_id, levels, [word.id for word in words], limit - len(words))
+            if gaps:
+                log.debug('new_words.gaps', user_id=user_id, count=len(gaps))
+            words.extend(gaps)
+        
+        if words:
+            log.debug('new_words.found', user_id=user_id, count=len(words))
+        else:
+            log.debug('new_words.none', user_id=user_id)
+        return words
     
-    @classmethod
-    def get_new_words(cls, user_id, limit=5):
-        """دریافت کلمات جدید برای کاربر"""
-        from models import Word, UserWord, db
-        from sqlalchemy import and_, not_
-        
-        # کلماتی که کاربر هنوز ندیده
-        subquery = db.session.query(UserWord.word_id).filter(UserWord.user_id == user_id)
-        user_level = db.session.query(db.func.max(User.current_level)).filter(User.id == user_id).scalar() or 'A1'
-        
-        new_words = Word.query.filter(
-            and_(
-                Word.cefr_level == user_level,
-                not_(Word.id.in_(subquery))
+    @staticmethod
+    def _frontier_levels(user_level):
+        """سطوحی که کلمات جدید از آنها انتخاب می‌شوند: A1 تا سطح کاربر"""
+        if user_level not in CEFR_LEVELS:
+            return [CEFR_LEVELS[0]]
+        return list(CEFR_LEVELS[:CEFR_LEVELS.index(user_level) + 1])
+    
+    @staticmethod
+    def _load_frontier(user, levels):
+        """مرز ذخیره‌شده کاربر [level, lesson, frequency_rank, id] یا None"""
+        try:
+            frontier = json.loads(user.new_word_frontier or 'null')
+        except ValueError:
+            return None
+        if not isinstance(frontier, list) or len(frontier) != 4 or frontier[0] not in levels:
+            return None
+        return frontier
+    
+    @staticmethod
+    def _lessons(level):
+        """درس‌های یک سطح به ترتیب عددی (پیمایش فقط روی ایندکس)"""
+        lessons = db.session.query(Word.lesson).filter(Word.cefr_level == level).distinct()
+        return sorted((lesson for (lesson,) in lessons), key=_lesson_order)
+    
+    @staticmethod
+    def _scan_lesson(user_id, level, lesson, start, limit):
+        """کلمات یک درس از نقطه start به ترتیب مرز، همراه با معرفی‌شده بودن
+        
+        دسته‌ها تا پیدا شدن limit کلمه معرفی‌نشده یا پایان درس خوانده می‌شوند.
+        """
+        batch_size = limit + FRONTIER_SCAN_SLACK
+        found = 0
+        while True:
+            query = db.session.query(Word, UserWord.id).outerjoin(
+                UserWord, and_(UserWord.word_id == Word.id, UserWord.user_id == user_id)
+            ).filter(
+                Word.cefr_level == level,
+                Word.lesson.is_(None) if lesson is None else Word.lesson == lesson
             )
-        ).order_by(
-            Word.frequency_rank.asc()
-        ).limit(limit).all()
+            if start:
+                rank, word_id = start
+                query = query.filter(or_(
+                    Word.frequency_rank > rank,
+                    and_(Word.frequency_rank == rank, Word.id >= word_id)
+                ))
+            rows = query.order_by(Word.frequency_rank.asc(), Word.id.asc()).limit(batch_size).all()
+            
+            for word, user_word_id in rows:
+                yield word, user_word_id is not None
+                if user_word_id is None:
+                    found += 1
+            if found >= limit or len(rows) < batch_size:
+                return
+            last = rows[-1][0]
+            start = (last.frequency_rank, last.id + 1)
+    
+    @staticmethod
+    def _gap_words(user_id, levels, exclude_ids, limit):
+        """کلمات معرفی‌نشده در هر جای سطوح داده‌شده (anti-join کامل)
+        
+        درس‌ها مانند مرز به ترتیب عددی (_lesson_order) پیمایش می‌شوند، نه به
+        ترتیب رشته‌ای ستون lesson که '10' را پیش از '2' می‌گذارد.
+        """
+        words = []
+        for level in levels:
+            for lesson in SpacedRepetitionEngine._lessons(level):
+                query = db.session.query(Word).outerjoin(
+                    UserWord, and_(UserWord.word_id == Word.id, UserWord.user_id == user_id)
+                ).filter(
+                    Word.cefr_level == level,
+                    Word.lesson.is_(None) if lesson is None else Word.lesson == lesson,
+                    UserWord.id.is_(None)
+                )
+                if exclude_ids:
+                    query = query.filter(Word.id.notin_(exclude_ids))
+                words += query.order_by(
+                    Word.frequency_rank.asc(), Word.id.asc()
+                ).limit(limit - len(words)).all()
+                if len(words) >= limit:
+                    return words
+        return words
+    
+    @staticmethod
+    def should_introduce_new_words(user_id, due_count):
+        """تعیین آیا باید کلمات جدید معرفی شود یا نه
         
-        return new_words
\ No newline at end of file
+        شمارنده‌ها از word_counters خوانده می‌شوند و برای کاربر فعال کوئری ندارد.
+        """
+        # شمارش کلمات کاربر
+        counts = word_counters.get(user_id, SpacedRepetitionEngine._load_state_counts)
+        total_user_words = sum(counts.values())
+        
+        # ========== **اصلاح بحرانی** ==========
+        # کاربر جدید → حتماً کلمه جدید معرفی کن
+        if total_user_words == 0:
+            log.debug('new_words.decision', user_id=user_id, introduce=True, reason='new_user')
+            return True
+        
+        # اگر کاربر کلمات زیادی برای مرور دارد، کلمات جدید اضافه نکن
+        if due_count >= 8:
+            log.debug('new_words.decision', user_id=user_id, introduce=False, reason='too_many_due', due=due_count)
+            return False
+        
+        # اگر کاربر کلمات جدید زیادی دارد (بیش از ۵ تا)، منتظر بمان
+        new_words_count = counts['new']
+        
+        if new_words_count > 5:
+            log.debug('new_words.decision', user_id=user_id, introduce=False, reason='too_many_new', new=new_words_count)
+            return False
+        
+        # محاسبه نسبت کلمات تسلط یافته
+        mastered_count = counts['mastered']
+        
+        if total_user_words > 0:
+            mastery_ratio = mastered_count / total_user_words
+            
+            # اگر کاربر کمتر از ۳۰٪ کلمات را تسلط یافته، کلمات جدید اضافه کن
+            if mastery_ratio < 0.3:
+                log.debug('new_words.decision', user_id=user_id, introduce=True, reason='low_mastery', mastery=round(mastery_ratio, 2))
+                return True
+            else:
+                log.debug('new_words.decision', user_id=user_id, introduce=False, reason='high_mastery', mastery=round(mastery_ratio, 2))
+                return False
+        
+        # حالت پیش‌فرض: کلمات جدید معرفی کن
+        log.debug('new_words.decision', user_id=user_id, introduce=True, reason='default')
+        return True
+    
+    @staticmethod
+    def _load_state_counts(user_id):
+        """تعداد UserWordهای کاربر به تفکیک وضعیت در یک کوئری"""
+        return dict(db.session.query(
+            UserWord.memory_state, func.count(UserWord.id)
+        ).filter(
+            UserWord.user_id == user_id
+        ).group_by(UserWord.memory_state).all())
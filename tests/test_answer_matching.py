@@ -0,0 +1,85 @@
+"""
+تطبیق پاسخ‌های تایپی: یکسان‌سازی umlaut/ß، حرف تعریف اختیاری و فاصله ویرایشی محدود
+"""
+import random
+from collections import namedtuple
+
+import pytest
+
+from utils.answer_matching import (
+    NO_MATCH, AnswerKey, _full_distance, bounded_distance, compile_answer, match_answer
+)
+
+Entry = namedtuple('Entry', 'lemma article plural')
+
+HAUS = Entry('Haus', 'das', 'Häuser')
+
+@pytest.mark.parametrize('lemma, answer', [
+    ('Mädchen', 'Maedchen'),
+    ('Mädchen', 'mädchen'),
+    ('Straße', 'Strasse'),
+    ('Straße', 'STRASSE'),
+    ('Übung', 'uebung'),
+    ('Öl', 'Oel'),
+])
+def test_umlaut_and_eszett_folding_is_exact(lemma, answer):
+    result = match_answer(Entry(lemma, None, None), answer)
+    assert result.correct and result.exact
+
+@pytest.mark.parametrize('answer', ['Haus', 'das Haus', ' Das  Haus. ', 'Häuser', 'die Häuser', 'die Haeuser'])
+def test_article_is_optional(answer):
+    result = match_answer(HAUS, answer)
+    assert result.correct and result.exact
+
+@pytest.mark.parametrize('answer', ['der Haus', 'die Haus', 'das Häuser', 'den Haus'])
+def test_wrong_article_is_rejected(answer):
+    assert not match_answer(HAUS, answer).correct
+
+def test_typo_is_accepted_with_its_own_article():
+    result = match_answer(HAUS, 'das Hause')
+    assert result.correct and not result.exact and result.distance == 1
+
+def test_other_lemma_is_not_a_typo():
+    tisch = Entry('Tisch', 'der', 'Tische')
+    assert match_answer(tisch, 'Fisch').correct
+    assert not match_answer(tisch, 'Fisch', other_lemmas=frozenset({'fisch'})).correct
+
+@pytest.mark.parametrize('answer', [None, '', '   ', '?!', '„“'])
+def test_empty_answer_is_no_match(answer):
+    assert match_answer(HAUS, answer) is NO_MATCH
+
+def test_compiled_key_is_cached():
+    assert compile_answer('Haus', 'das', 'Häuser') is compile_answer('Haus', 'das', 'Häuser')
+    assert isinstance(compile_answer('Haus', 'das', 'Häuser'), AnswerKey)
+
+@pytest.mark.parametrize('a, b, limit, expected', [
+    ('kitten', 'sitting', 3, 3),
+    ('kitten', 'sitting', 2, 3),
+    ('abc', 'abcde', 1, 2),
+    ('abcd', 'dcba', 4, 4),
+    ('abcd', 'dcba', 3, 4),
+    ('', 'ab', 2, 2),
+    ('same', 'same', 0, 0),
+])
+def test_bounded_distance_at_band_edge(a, b, limit, expected):
+    assert bounded_distance(a, b, limit) == expected
+    assert bounded_distance(a, b, limit) == min(_full_distance(a, b), limit + 1)
+
+def test_bounded_distance_matches_full_levenshtein():
+    rng = random.Random(42)
+    for _ in range(5000):
+        a = ''.join(rng.choice('abcde') for _ in range(rng.randint(0, 9)))
+        b = list(a)
+        for _ in range(rng.randint(0, 4)):
+            position = rng.randint(0, len(b))
+            kind = rng.randrange(3)
+            if kind == 0:
+                b.insert(position, rng.choice('abcde'))
+            elif kind == 1 and position < len(b):
+                del b[position]
+            elif position < len(b):
+                b[position] = rng.choice('abcde')
+        b = ''.join(b)
+        full = _full_distance(a, b)
+        for limit in range(4):
+            assert bounded_distance(a, b, limit) == min(full, limit + 1), (a, b, limit)
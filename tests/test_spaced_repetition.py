@@ -0,0 +1,46 @@
+"""
+هم‌خوانی review_step (اسکالر) و review_batch (برداری)
+"""
+import random
+
+import numpy as np
+import pytest
+
+from spaced_repetition import STATES, SpacedRepetitionEngine
+
+def _random_reviews(count, seed=42):
+    rng = random.Random(seed)
+    return [
+        (
+            rng.random(),
+            rng.randint(0, 12),
+            rng.uniform(0.0, 0.5),
+            rng.uniform(0.5, 15.0),
+            rng.random() < 0.7
+        )
+        for _ in range(count)
+    ]
+
+def test_review_batch_matches_review_step():
+    reviews = _random_reviews(20000)
+    strength, consecutive, state_index, interval_hours = SpacedRepetitionEngine.review_batch(
+        *(np.array(column) for column in zip(*reviews))
+    )
+    
+    for index, review in enumerate(reviews):
+        expected = SpacedRepetitionEngine.review_step(*review)
+        actual = (
+            strength[index],
+            consecutive[index],
+            STATES[state_index[index]],
+            interval_hours[index]
+        )
+        assert actual == expected, review
+
+def test_review_step_interval_is_scheduled_interval():
+    for review in _random_reviews(2000, seed=7):
+        strength, consecutive, state, interval_hours = SpacedRepetitionEngine.review_step(*review)
+        raw_hours = SpacedRepetitionEngine._interval_hours(state, consecutive, strength, review[2], review[4])
+        delta = SpacedRepetitionEngine._interval_delta(raw_hours)
+        # timedelta دقت میکروثانیه دارد
+        assert delta.total_seconds() == pytest.approx(interval_hours * 3600, abs=1e-6)
@@ -0,0 +1,53 @@
+"""
+آمار تجمیعی: شمارش کلمات موعد مرور از روی سطل‌های ساعتی user_stats
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+
+from models import db, User, Word, UserWord
+from utils.user_stats import get_user_word_summary, rebuild_user_stats, stats_summary
+
+NOW = datetime(2026, 3, 1, 10, 30)
+
+@pytest.fixture
+def user_id():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        user = User(username='u', email='u@example.com')
+        db.session.add(user)
+        db.session.flush()
+        yield user.id
+        db.session.remove()
+
+def _add_words(user_id, schedule):
+    for index, (state, next_review) in enumerate(schedule):
+        word = Word(lemma=f'Wort{index}', article='das')
+        db.session.add(word)
+        db.session.flush()
+        db.session.add(UserWord(user_id=user_id, word_id=word.id, memory_state=state, next_review=next_review))
+    db.session.flush()
+
+def test_current_hour_is_counted_exactly(user_id):
+    _add_words(user_id, [
+        ('learning', NOW - timedelta(hours=3)),
+        ('learning', NOW - timedelta(minutes=20)),
+        ('reviewing', NOW),
+        ('reviewing', NOW + timedelta(minutes=20)),
+        ('mastered', NOW - timedelta(minutes=10)),
+        ('learning', NOW + timedelta(hours=5)),
+        ('reviewing', NOW + timedelta(days=3)),
+    ])
+    summary = stats_summary(rebuild_user_stats(user_id, now=NOW), now=NOW)
+    assert summary['due'] == get_user_word_summary(user_id, now=NOW)['due'] == 3
+    assert summary['due_soon'] == {'now': 3, 'next_24h': 2, 'next_7d': 1}
+
+def test_later_in_the_hour_becomes_due(user_id):
+    _add_words(user_id, [('learning', NOW + timedelta(minutes=20))])
+    stats = rebuild_user_stats(user_id, now=NOW)
+    assert stats_summary(stats, now=NOW)['due'] == 0
+    assert stats_summary(stats, now=NOW + timedelta(minutes=25))['due'] == 1
@@ -0,0 +1,144 @@
+"""
+بارگذار واژگان: تجزیه جریانی آرایه JSON و همگام‌سازی با مانیفست
+"""
+import io
+import json
+import os
+
+import pytest
+from flask import Flask
+
+from models import db, User, Word, UserWord, VocabularyFile
+from utils.vocabulary_loader import VocabularyLoader, iter_json_array
+
+DOCUMENT = [
+    {'word': {'lemma': 'Haus', 'article': 'das'}, 'meaning': {'persian_translation': 'خانه, [منزل]'}},
+    12345678901234567890,
+    -1.5e-3,
+    'ein "Zitat" mit , und ]',
+    [1, [2, []], {}],
+    None,
+    True,
+    {'nested': {'deep': [{'x': 'ü'}]}},
+]
+
+@pytest.mark.parametrize('read_size', [1, 2, 3, 5, 7, 16, 65536])
+@pytest.mark.parametrize('indent', [None, 2])
+def test_items_across_chunk_boundaries(read_size, indent):
+    text = '﻿ \n' + json.dumps(DOCUMENT, ensure_ascii=False, indent=indent) + '\n'
+    assert list(iter_json_array(io.StringIO(text), read_size=read_size)) == DOCUMENT
+
+@pytest.mark.parametrize('text', ['[]', ' [ \n ] ', '[\t]'])
+def test_empty_array(text):
+    assert list(iter_json_array(io.StringIO(text), read_size=1)) == []
+
+@pytest.mark.parametrize('text', [
+    '[1 2]',
+    '[1,,2]',
+    '[1,]',
+    '[1, ]',
+    '[,1]',
+    '[,]',
+    '[1}',
+    '[1',
+    '[1,2',
+    '[',
+    '{"a": 1}',
+    '',
+    '["a" "b"]',
+    '[{"a": 1}{"b": 2}]',
+])
+@pytest.mark.parametrize('read_size', [1, 3, 65536])
+def test_malformed_input_is_rejected(text, read_size):
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(text), read_size=read_size))
+
+# ===== sync_all_files =====
+def _entry(lemma, translation, article='der'):
+    return {
+        'word': {'lemma': lemma, 'article': article, 'level': 'A1', 'Lesson': '1'},
+        'meaning': {'persian_translation': translation}
+    }
+
+def _write(path, entries, mtime=None):
+    path.write_text(json.dumps(entries, ensure_ascii=False), encoding='utf-8')
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+@pytest.fixture
+def loader(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        loader = VocabularyLoader()
+        loader.project_root = tmp_path
+        loader.data_path = tmp_path / 'data'
+        loader.data_path.mkdir()
+        yield loader
+        db.session.remove()
+
+def _translations():
+    return {word.lemma: word.persian_translation for word in Word.query}
+
+def test_sync_skips_unchanged_files(loader):
+    _write(loader.data_path / 'a.json', [_entry('Tisch', 'میز')], mtime=1_000_000)
+    first = loader.sync_all_files()
+    assert first['files_synced'] == 1 and first['inserted'] == 1
+    
+    second = loader.sync_all_files()
+    assert second['files_unchanged'] == 1
+    assert second['files_synced'] == 0
+    assert second['inserted'] == second['updated'] == second['deleted'] == 0
+    
+    # فقط mtime عوض شده: هش محتوا یکسان است و فایل دوباره اعمال نمی‌شود
+    os.utime(loader.data_path / 'a.json', (2_000_000, 2_000_000))
+    third = loader.sync_all_files()
+    assert third['files_unchanged'] == 1 and third['files_synced'] == 0
+    assert VocabularyFile.query.filter_by(path='data/a.json').one().mtime == 2_000_000
+
+def test_sync_updates_and_inserts_changed_rows(loader):
+    path = loader.data_path / 'a.json'
+    _write(path, [_entry('Tisch', 'میز'), _entry('Stuhl', 'صندلی')], mtime=1_000_000)
+    loader.sync_all_files()
+    tisch_id = Word.query.filter_by(lemma='Tisch').one().id
+    
+    _write(path, [_entry('Tisch', 'میز تحریر'), _entry('Stuhl', 'صندلی'), _entry('Lampe', 'چراغ', 'die')],
+           mtime=1_000_100)
+    result = loader.sync_all_files()
+    assert (result['inserted'], result['updated'], result['deleted']) == (1, 1, 0)
+    assert _translations() == {'Tisch': 'میز تحریر', 'Stuhl': 'صندلی', 'Lampe': 'چراغ'}
+    # بروزرسانی در جا: شناسه کلمه و پیشرفت کاربران حفظ می‌شود
+    assert Word.query.filter_by(lemma='Tisch').one().id == tisch_id
+    
+    _write(path, [_entry('Tisch', 'میز تحریر'), _entry('Lampe', 'چراغ', 'die')], mtime=1_000_200)
+    result = loader.sync_all_files()
+    assert (result['inserted'], result['updated'], result['deleted']) == (0, 0, 1)
+    assert set(_translations()) == {'Tisch', 'Lampe'}
+
+def test_sync_keeps_words_of_removed_file(loader):
+    _write(loader.data_path / 'a.json', [_entry('Tisch', 'میز')], mtime=1_000_000)
+    _write(loader.data_path / 'b.json', [_entry('Stuhl', 'صندلی'), _entry('Lampe', 'چراغ', 'die')], mtime=1_000_000)
+    loader.sync_all_files()
+    user = User(username='u', email='u@example.com')
+    db.session.add(user)
+    db.session.flush()
+    db.session.add(UserWord(user_id=user.id, word_id=Word.query.filter_by(lemma='Stuhl').one().id))
+    db.session.commit()
+    
+    (loader.data_path / 'b.json').unlink()
+    # فایل دیگری که کلمه‌ای از فایل برداشته‌شده را هم نداشته، آن را حذف نمی‌کند
+    _write(loader.data_path / 'a.json', [_entry('Tisch', 'میز')], mtime=1_000_100)
+    result = loader.sync_all_files()
+    assert result['deleted'] == 0
+    assert set(_translations()) == {'Tisch', 'Stuhl', 'Lampe'}
+    assert UserWord.query.count() == 1
+    assert VocabularyFile.query.filter_by(path='data/b.json').first() is None
+    
+    # بازگشت فایل: کلمات موجود با همان شناسه‌ها دوباره به آن نسبت داده می‌شوند
+    stuhl_id = Word.query.filter_by(lemma='Stuhl').one().id
+    _write(loader.data_path / 'b.json', [_entry('Stuhl', 'صندلی')], mtime=1_000_200)
+    result = loader.sync_all_files()
+    assert (result['inserted'], result['deleted']) == (0, 0)
+    assert Word.query.filter_by(lemma='Stuhl').one().id == stuhl_id
@@ -0,0 +1,208 @@
+"""
+تطبیق پاسخ‌های تایپی با صورت‌های از پیش نرمال‌شده هر کلمه
+
+برای هر (lemma, article, plural) یک بار مجموعه صورت‌های قابل قبول ساخته و
+کش می‌شود: یکسان‌سازی umlaut و ß (ä↔ae، ß↔ss)، با و بدون حرف تعریف و صورت
+جمع. پاسخ اول با جستجوی مستقیم در مجموعه و در صورت عدم تطابق با فاصله
+ویرایشی محدود (با خروج زودهنگام) برای غلط تایپی بررسی می‌شود.
+"""
+import random
+import time
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+
+ARTICLES = frozenset(('der', 'die', 'das', 'den', 'dem', 'des', 'ein', 'eine', 'einen', 'einem', 'einer', 'eines'))
+
+# حرف تعریف صورت جمع
+PLURAL_ARTICLE = 'die'
+
+_FOLD = str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue', 'ß': 'ss'})
+_PUNCTUATION = '.,;:!?"\'«»„“”()'
+
+Match = namedtuple('Match', 'correct exact distance')
+
+NO_MATCH = Match(False, False, None)
+
+def fold(text):
+    """نرمال‌سازی برای مقایسه: حروف کوچک، umlaut و ß باز شده، فاصله‌های یکسان"""
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFC', text).casefold().translate(_FOLD)
+    return ' '.join(text.strip().strip(_PUNCTUATION).split())
+
+def typo_tolerance(length):
+    """حداکثر فاصله ویرایشی مجاز برای پاسخی به طول length"""
+    if length <= 3:
+        return 0
+    if length <= 7:
+        return 1
+    return 2
+
+def bounded_distance(a, b, limit):
+    """فاصله Levenshtein دو رشته اگر حداکثر limit باشد، در غیر این صورت limit + 1
+    
+    فقط نوار |i - j| <= limit از جدول محاسبه می‌شود و به محض اینکه کمینه
+    یک سطر از limit بیشتر شود محاسبه متوقف می‌شود.
+    """
+    if a == b:
+        return 0
+    over = limit + 1
+    if abs(len(a) - len(b)) > limit:
+        return over
+    if len(a) > len(b):
+        a, b = b, a
+    
+    width = len(b)
+    previous = list(range(width + 1))
+    for i, char in enumerate(a, 1):
+        current = [over] * (width + 1)
+        current[0] = i
+        row_min = i
+        for j in range(max(1, i - limit), min(width, i + limit) + 1):
+            value = previous[j - 1] + (char != b[j - 1])
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > limit:
+            return over
+        previous = current
+    return previous[width] if previous[width] <= limit else over
+
+class AnswerKey:
+    """صورت‌های نرمال‌شده قابل قبول یک کلمه
+    
+    هر صورت یک جفت (حرف تعریف، واژه) است: lemma بدون حرف تعریف و با حرف
+    تعریف خودش، و صورت جمع بدون حرف تعریف و با 'die'. حرف تعریف پاسخ باید
+    دقیقاً با حرف تعریف همان صورت یکی باشد و غلط تایپی فقط در واژه پذیرفته می‌شود.
+    """
+    __slots__ = ('forms', 'exact')
+    
+    def __init__(self, lemma, article=None, plural=None):
+        lemma = fold(lemma)
+        article = fold(article)
+        plural = fold(plural)
+        
+        forms = {('', lemma)}
+        if article:
+            forms.add((article, lemma))
+        if plural:
+            forms.add(('', plural))
+            forms.add((PLURAL_ARTICLE, plural))
+        self.forms = frozenset(form for form in forms if form[1])
+        self.exact = frozenset(' '.join(filter(None, form)) for form in self.forms)
+    
+    def match(self, answer, other_lemmas=frozenset()):
+        """بررسی پاسخ؛ خروجی Match(درست، بدون غلط، فاصله ویرایشی)
+        
+        پاسخی که دقیقاً یکی از other_lemmas (واژه‌های دیگر واژگان، نرمال‌شده)
+        باشد به عنوان غلط تایپی پذیرفته نمی‌شود.
+        """
+        text = fold(answer)
+        if not text:
+            return NO_MATCH
+        if text in self.exact:
+            return Match(True, True, 0)
+        
+        answer_article, _, rest = text.partition(' ')
+        if not (rest and answer_article in ARTICLES):
+            answer_article, rest = '', text
+        if rest in other_lemmas:
+            return NO_MATCH
+        
+        best = None
+        for form_article, form in self.forms:
+            # حرف تعریف اشتباه با غلط تایپی جبران نمی‌شود
+            if form_article != answer_article:
+                continue
+            limit = typo_tolerance(len(form))
+            if best is not None:
+                limit = min(limit, best - 1)
+            if limit <= 0:
+                continue
+            distance = bounded_distance(rest, form, limit)
+            if distance <= limit:
+                best = distance
+        if best is None:
+            return NO_MATCH
+        return Match(True, False, best)
+
+@lru_cache(maxsize=20000)
+def compile_answer(lemma, article=None, plural=None):
+    """AnswerKey کش‌شده؛ با تغییر مقادیر کلمه کلید جدید ساخته می‌شود"""
+    return AnswerKey(lemma, article, plural)
+
+def match_answer(word, answer, other_lemmas=frozenset()):
+    """تطبیق پاسخ تایپی با کلمه (Word یا هر شیء با lemma، article و plural)"""
+    return compile_answer(word.lemma, word.article, getattr(word, 'plural', None)).match(answer, other_lemmas)
+
+def naive_match(lemma, article, plural, answer):
+    """پیاده‌سازی ساده برای مقایسه: نرمال‌سازی و Levenshtein کامل با همه صورت‌ها در هر بار"""
+    text = fold(answer)
+    forms = [fold(lemma)]
+    if article:
+        forms.append(fold(f'{article} {lemma}'))
+    if plural:
+        forms += [fold(plural), fold(f'{PLURAL_ARTICLE} {plural}')]
+    for form in forms:
+        if _full_distance(text, form) <= typo_tolerance(len(form)):
+            return True
+    return False
+
+def _full_distance(a, b):
+    previous = list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        current = [i]
+        for j, other in enumerate(b, 1):
+            current.append(min(previous[j - 1] + (char != other), current[j - 1] + 1, previous[j] + 1))
+        previous = current
+    return previous[-1]
+
+def benchmark_matching(entries, checks=20000, seed=42):
+    """
+    سنجش زمان هر بررسی روی entries (تاپل‌های lemma, article, plural)
+    
+    پاسخ‌ها ترکیبی از پاسخ درست، با حرف تعریف، بدون umlaut، با یک غلط تایپی و
+    پاسخ کاملاً اشتباه هستند. خروجی: میکروثانیه برای هر بررسی در حالت
+    کامپایل‌شده (سرد و گرم) و پیاده‌سازی ساده.
+    """
+    rng = random.Random(seed)
+    entries = [entry for entry in entries if entry[0]]
+    samples = []
+    for _ in range(checks):
+        lemma, article, plural = rng.choice(entries)
+        kind = rng.randrange(5)
+        if kind == 0:
+            answer = lemma
+        elif kind == 1:
+            answer = f'{article} {lemma}' if article else lemma
+        elif kind == 2:
+            answer = lemma.replace('ä', 'a').replace('ö', 'o').replace('ü', 'u').replace('ß', 'ss')
+        elif kind == 3:
+            position = rng.randrange(len(lemma))
+            answer = lemma[:position] + rng.choice('abcdefghijklmnopqrstuvwxyz') + lemma[position + 1:]
+        else:
+            answer = rng.choice(entries)[0][::-1]
+        samples.append(((lemma, article, plural), answer))
+    
+    other_lemmas = frozenset(fold(entry[0]) for entry in entries)
+    compile_answer.cache_clear()
+    report = {'checks': checks, 'words': len(entries)}
+    for label in ('compiled_cold', 'compiled_warm'):
+        started = time.perf_counter()
+        accepted = 0
+        for key, answer in samples:
+            accepted += compile_answer(*key).match(answer, other_lemmas).correct
+        elapsed = time.perf_counter() - started
+        report[f'{label}_us'] = round(elapsed / checks * 1e6, 2)
+        report['accepted'] = accepted
+    
+    started = time.perf_counter()
+    for (lemma, article, plural), answer in samples:
+        naive_match(lemma, article, plural, answer)
+    report['naive_us'] = round((time.perf_counter() - started) / checks * 1e6, 2)
+    return report
@@ -0,0 +1,44 @@
+"""
+مسیریابی خواندن/نوشتن بین موتور اصلی و موتور فقط‌خواندنی
+
+اگر SQLALCHEMY_BINDS کلید 'read' داشته باشد (مثلاً replica پستگرس یا
+sqlite:///file:...?mode=ro&uri=true روی یک snapshot)، SELECTهای داخل
+read_only_scope یا نماهای read_only روی آن اجرا می‌شوند. flush و دستورات
+INSERT/UPDATE/DELETE همیشه روی موتور اصلی می‌روند. بدون این کلید همه چیز
+روی موتور اصلی می‌ماند.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from flask_sqlalchemy.session import Session
+
+READ_BIND = 'read'
+
+_read_only = ContextVar('solingo_read_only', default=False)
+
+class RoutingSession(Session):
+    """Session که در حالت فقط‌خواندنی SELECTها را به موتور READ_BIND می‌فرستد"""
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and _read_only.get() and not self._flushing and not getattr(clause, 'is_dml', False):
+            engine = self._db.engines.get(READ_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+@contextmanager
+def read_only_scope():
+    """اجرای خواندن‌های داخل بلوک روی موتور فقط‌خواندنی (در صورت وجود)"""
+    token = _read_only.set(True)
+    try:
+        yield
+    finally:
+        _read_only.reset(token)
+
+def read_only(view):
+    """دکوریتور نماهایی که فقط می‌خوانند و تأخیر replica برایشان مهم نیست"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with read_only_scope():
+            return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,123 @@
+"""
+صف موعد مرور درون‌پروسه‌ای برای هر کاربر فعال
+"""
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+class DueQueue:
+    """صف موعد مرور یک کاربر: min-heap بر اساس next_review و سپس memory_strength
+    
+    بروزرسانی‌ها به صورت تنبل اعمال می‌شوند: ورودی جدید به heap اضافه می‌شود
+    و ورودی‌های قدیمی هنگام pop (با مقایسه با _entries) دور ریخته می‌شوند.
+    """
+    
+    def __init__(self, entries=()):
+        self._lock = threading.Lock()
+        self._entries = {}
+        for user_word_id, next_review, strength in entries:
+            self._entries[user_word_id] = (next_review or datetime.min, strength or 0.0)
+        self._heap = [(due, strength, user_word_id) for user_word_id, (due, strength) in self._entries.items()]
+        heapq.heapify(self._heap)
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def update(self, user_word_id, next_review, strength):
+        """افزودن یا جابه‌جایی یک کلمه در صف"""
+        key = (next_review or datetime.min, strength or 0.0)
+        with self._lock:
+            if self._entries.get(user_word_id) == key:
+                return
+            self._entries[user_word_id] = key
+            heapq.heappush(self._heap, (key[0], key[1], user_word_id))
+            self._compact()
+    
+    def remove(self, user_word_id):
+        """حذف یک کلمه از صف (مثلاً پس از رسیدن به mastered)"""
+        with self._lock:
+            self._entries.pop(user_word_id, None)
+            self._compact()
+    
+    def pop_due(self, now, limit):
+        """شناسه حداکثر limit کلمه که موعد مرورشان رسیده، به ترتیب صف
+        
+        کلمات از صف حذف نمی‌شوند؛ تا زمانی که مرور نشده‌اند موعدشان باقی است.
+        هزینه: O(k log n)
+        """
+        result = []
+        with self._lock:
+            while self._heap and len(result) < limit:
+                due, strength, user_word_id = self._heap[0]
+                if self._entries.get(user_word_id) != (due, strength):
+                    heapq.heappop(self._heap)
+                    continue
+                if due > now:
+                    break
+                result.append(heapq.heappop(self._heap))
+            for item in result:
+                heapq.heappush(self._heap, item)
+        return [user_word_id for _, _, user_word_id in result]
+    
+    def _compact(self):
+        """بازسازی heap وقتی ورودی‌های منقضی بیش از حد زیاد شده‌اند"""
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [(due, strength, user_word_id) for user_word_id, (due, strength) in self._entries.items()]
+            heapq.heapify(self._heap)
+
+class DueQueueRegistry:
+    """نگهداری صف‌های کاربران فعال با حذف LRU و بازسازی دوره‌ای از دیتابیس"""
+    
+    def __init__(self, max_users=5000, max_age=300):
+        self.max_users = max_users
+        # صف‌ها پس از max_age ثانیه دوباره از دیتابیس ساخته می‌شوند تا
+        # تغییرات پروسه‌های دیگر (مثل manage.py reschedule) دیده شوند
+        self.max_age = max_age
+        self._queues = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, user_id, loader):
+        """صف کاربر؛ در صورت نبود یا قدیمی بودن با loader(user_id) ساخته می‌شود"""
+        with self._lock:
+            item = self._queues.get(user_id)
+            if item and time.monotonic() - item[1] < self.max_age:
+                self._queues.move_to_end(user_id)
+                return item[0]
+        
+        queue = DueQueue(loader(user_id))
+        with self._lock:
+            self._queues[user_id] = (queue, time.monotonic())
+            self._queues.move_to_end(user_id)
+            while len(self._queues) > self.max_users:
+                self._queues.popitem(last=False)
+        return queue
+    
+    def peek(self, user_id):
+        """صف کاربر اگر قبلاً ساخته شده باشد (بدون دسترسی به دیتابیس)"""
+        with self._lock:
+            item = self._queues.get(user_id)
+        return item[0] if item else None
+    
+    def update(self, user_word):
+        """اعمال وضعیت جدید یک UserWord روی صف کاربرش (اگر صف وجود دارد)"""
+        if user_word.id is None or user_word.user_id is None:
+            return
+        queue = self.peek(user_word.user_id)
+        if queue is None:
+            return
+        if user_word.memory_state == 'mastered':
+            queue.remove(user_word.id)
+        else:
+            queue.update(user_word.id, user_word.next_review, user_word.memory_strength)
+    
+    def invalidate(self, user_id=None):
+        """حذف صف یک کاربر یا همه کاربران تا در دسترسی بعدی دوباره ساخته شوند"""
+        with self._lock:
+            if user_id is None:
+                self._queues.clear()
+            else:
+                self._queues.pop(user_id, None)
+
+due_queues = DueQueueRegistry()
@@ -0,0 +1,100 @@
+"""
+بانک تمرین‌های از پیش ساخته شده برای هر کلمه و نوع تمرین
+"""
+import json
+import random
+import time
+from sqlalchemy import delete, insert, tuple_
+from models import db, Word, ExerciseBank
+
+BANKED_TYPES = (
+    'multiple_choice', 'multiple_choice_article', 'typing', 'article_choice',
+    'recognition', 'sentence_completion', 'reverse_translation'
+)
+
+# تمرین‌هایی که بخش تصادفی ندارند فقط یک نسخه لازم دارند
+SINGLE_VARIANT_TYPES = ('typing',)
+
+def build_exercise_bank(builder, variants=5, chunk_size=1000, progress=print):
+    """
+    ساخت دوباره کامل بانک تمرین
+    
+    builder(word, exercise_type) خروجی یک تمرین را می‌سازد؛ برای هر کلمه و
+    نوع تمرین variants نسخه با گزینه‌های انحرافی متفاوت ذخیره می‌شود.
+    """
+    started = time.perf_counter()
+    db.session.execute(delete(ExerciseBank))
+    
+    words = 0
+    exercises = 0
+    last_id = 0
+    while True:
+        chunk = Word.query.filter(Word.id > last_id).order_by(Word.id).limit(chunk_size).all()
+        if not chunk:
+            break
+        
+        rows = []
+        for word in chunk:
+            for exercise_type in BANKED_TYPES:
+                count = 1 if exercise_type in SINGLE_VARIANT_TYPES else variants
+                for variant in range(count):
+                    rows.append({
+                        'word_id': word.id,
+                        'exercise_type': exercise_type,
+                        'variant': variant,
+                        'payload': json.dumps(builder(word, exercise_type), ensure_ascii=False, separators=(',', ':'))
+                    })
+        db.session.execute(insert(ExerciseBank), rows)
+        db.session.commit()
+        
+        last_id = chunk[-1].id
+        words += len(chunk)
+        exercises += len(rows)
+        db.session.expunge_all()
+        
+        if progress:
+            progress(f"  ... {words} words, {exercises} exercises")
+    
+    db.session.commit()
+    elapsed = time.perf_counter() - started
+    return {
+        'words': words,
+        'exercises': exercises,
+        'elapsed': round(elapsed, 3),
+        'exercises_per_sec': round(exercises / elapsed) if elapsed > 0 else None
+    }
+
+def get_banked_exercise(word_id, exercise_type):
+    """یک نسخه تصادفی از تمرین ذخیره‌شده یا None اگر در بانک نباشد"""
+    payloads = db.session.query(ExerciseBank.payload).filter(
+        ExerciseBank.word_id == word_id,
+        ExerciseBank.exercise_type == exercise_type
+    ).all()
+    if not payloads:
+        return None
+    return json.loads(random.choice(payloads)[0])
+
+def get_banked_exercises(keys):
+    """نسخه‌های ذخیره‌شده برای چند (word_id, exercise_type) در یک کوئری"""
+    keys = list(set(keys))
+    banked = {}
+    if not keys:
+        return banked
+    rows = db.session.query(
+        ExerciseBank.word_id, ExerciseBank.exercise_type, ExerciseBank.payload
+    ).filter(tuple_(ExerciseBank.word_id, ExerciseBank.exercise_type).in_(keys))
+    for word_id, exercise_type, payload in rows:
+        banked.setdefault((word_id, exercise_type), []).append(payload)
+    return banked
+
+def pick_banked_exercise(banked, word_id, exercise_type):
+    """انتخاب تصادفی یک نسخه از خروجی get_banked_exercises یا None"""
+    payloads = banked.get((word_id, exercise_type))
+    return json.loads(random.choice(payloads)) if payloads else None
+
+def invalidate_exercises(word_ids=None):
+    """حذف تمرین‌های کلمات تغییر کرده (یا کل بانک) تا دوباره ساخته شوند"""
+    statement = delete(ExerciseBank)
+    if word_ids is not None:
+        statement = statement.where(ExerciseBank.word_id.in_(word_ids))
+    db.session.execute(statement)
@@ -0,0 +1,94 @@
+"""
+لاگ ساخت‌یافته برنامه با ارزیابی تنبل
+
+هر رکورد یک نام رویداد و چند فیلد کلید/مقدار دارد. اگر سطح لاگ فعال نباشد
+هیچ فیلدی ساخته نمی‌شود و مقادیر Lazy(...) (مثلاً کوئری‌های دیباگ) اجرا
+نمی‌شوند.
+"""
+import json
+import logging
+import sys
+
+ROOT_LOGGER = 'solingo'
+
+class Lazy:
+    """مقداری که فقط وقتی رکورد واقعاً ثبت می‌شود محاسبه می‌شود"""
+    __slots__ = ('func', 'args', 'kwargs')
+    
+    def __init__(self, func, *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+    
+    def resolve(self):
+        return self.func(*self.args, **self.kwargs)
+
+class StructuredLogger:
+    """پوشش logging.Logger با رویداد و فیلدهای کلید/مقدار"""
+    
+    def __init__(self, name):
+        self._logger = logging.getLogger(f'{ROOT_LOGGER}.{name}')
+    
+    def is_enabled(self, level):
+        return self._logger.isEnabledFor(level)
+    
+    def debug(self, event, **fields):
+        self._log(logging.DEBUG, event, fields)
+    
+    def info(self, event, **fields):
+        self._log(logging.INFO, event, fields)
+    
+    def warning(self, event, **fields):
+        self._log(logging.WARNING, event, fields)
+    
+    def error(self, event, **fields):
+        self._log(logging.ERROR, event, fields)
+    
+    def _log(self, level, event, fields):
+        if not self._logger.isEnabledFor(level):
+            return
+        fields = {
+            key: value.resolve() if isinstance(value, Lazy) else value
+            for key, value in fields.items()
+        }
+        self._logger.log(level, event, extra={'event': event, 'fields': fields}, stacklevel=3)
+
+class StructuredFormatter(logging.Formatter):
+    """قالب‌بندی رکوردها به صورت key=value یا یک خط JSON"""
+    
+    def __init__(self, json_lines=False):
+        super().__init__()
+        self.json_lines = json_lines
+    
+    def format(self, record):
+        fields = getattr(record, 'fields', {})
+        event = getattr(record, 'event', record.getMessage())
+        if self.json_lines:
+            return json.dumps({
+                'time': self.formatTime(record),
+                'level': record.levelname,
+                'logger': record.name,
+                'event': event,
+                **fields
+            }, ensure_ascii=False, default=str)
+        
+        parts = [self.formatTime(record), record.levelname, record.name, event]
+        for key, value in fields.items():
+            text = str(value)
+            # مقادیر چندخطی (مثل گزارش وضعیت کاربر) در خطوط جدا چاپ می‌شوند
+            parts.append(f'{key}=\n{text}' if '\n' in text else f'{key}={text}')
+        return ' '.join(parts)
+
+def get_logger(name):
+    """لاگر ساخت‌یافته زیر فضای نام solingo"""
+    return StructuredLogger(name)
+
+def configure_logging(level='INFO', json_lines=False, stream=None):
+    """تنظیم سطح و خروجی لاگ‌های برنامه (یک بار در شروع برنامه)"""
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.setLevel(level)
+    logger.propagate = False
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(StructuredFormatter(json_lines))
+    logger.handlers = [handler]
+    return logger
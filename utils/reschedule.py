@@ -0,0 +1,98 @@
+"""
+بازمحاسبه گروهی وضعیت و زمان مرور کلمات پس از تغییر پارامترهای الگوریتم
+"""
+import time
+from datetime import timedelta
+from pathlib import Path
+from sqlalchemy import select, update, bindparam
+from models import db, UserWord
+from spaced_repetition import SpacedRepetitionEngine, STATES
+
+def reschedule_user_words(chunk_size=5000, start_after=0, checkpoint_path=None, progress=print):
+    """
+    پیمایش user_words به صورت صفحه‌بندی کلیدی (id > آخرین id) و بازنویسی
+    memory_state و next_review با فرمول‌های فعلی موتور.
+    
+    next_review از last_reviewed محاسبه می‌شود؛ کلماتی که هنوز مرور نشده‌اند
+    فقط وضعیتشان بروز می‌شود. پس از هر بسته، آخرین id در checkpoint_path
+    نوشته می‌شود تا اجرای بعدی بتواند از همان نقطه ادامه دهد.
+    """
+    checkpoint = Path(checkpoint_path) if checkpoint_path else None
+    last_id = start_after
+    processed = 0
+    updated = 0
+    started = time.perf_counter()
+    
+    # UPDATE گروهی (executemany) بر اساس کلید اصلی در سطح core
+    statement = update(UserWord.__table__).where(
+        UserWord.__table__.c.id == bindparam('row_id')
+    ).values(
+        memory_state=bindparam('state'),
+        next_review=bindparam('due')
+    )
+    
+    columns = (
+        UserWord.id,
+        UserWord.memory_strength,
+        UserWord.consecutive_correct,
+        UserWord.decay_rate,
+        UserWord.last_reviewed,
+        UserWord.memory_state,
+        UserWord.next_review
+    )
+    
+    while True:
+        rows = db.session.execute(
+            select(*columns).where(UserWord.id > last_id).order_by(UserWord.id.asc()).limit(chunk_size)
+        ).all()
+        
+        if not rows:
+            break
+        
+        ids, strengths, consecutive, decay_rates, last_reviewed, states, due_dates = zip(*rows)
+        consecutive = [value or 0 for value in consecutive]
+        
+        state_index, interval_hours = SpacedRepetitionEngine.schedule_batch(
+            [value or 0.0 for value in strengths],
+            consecutive,
+            [0.3 if value is None else value for value in decay_rates],
+            [value > 0 for value in consecutive]
+        )
+        
+        changes = []
+        for row_id, reviewed_at, old_state, old_due, state_i, hours in zip(
+                ids, last_reviewed, states, due_dates, state_index.tolist(), interval_hours.tolist()):
+            state = STATES[state_i]
+            due = reviewed_at + timedelta(hours=hours) if reviewed_at else old_due
+            if state != old_state or due != old_due:
+                changes.append({'row_id': row_id, 'state': state, 'due': due})
+        
+        if changes:
+            db.session.execute(statement, changes)
+        db.session.commit()
+        
+        last_id = ids[-1]
+        processed += len(rows)
+        updated += len(changes)
+        if checkpoint:
+            checkpoint.write_text(str(last_id))
+        
+        if progress:
+            elapsed = time.perf_counter() - started
+            progress(f"  ⏩ id<={last_id}: {processed} rows, {updated} updated, {processed / elapsed:,.0f} rows/s")
+    
+    elapsed = time.perf_counter() - started
+    return {
+        'processed': processed,
+        'updated': updated,
+        'last_id': last_id,
+        'elapsed': round(elapsed, 3),
+        'rows_per_sec': round(processed / elapsed) if elapsed > 0 else None
+    }
+
+def read_checkpoint(checkpoint_path):
+    """آخرین id ثبت‌شده در checkpoint (یا 0)"""
+    path = Path(checkpoint_path)
+    if path.exists():
+        return int(path.read_text().strip() or 0)
+    return 0
@@ -0,0 +1,184 @@
+"""
+مهاجرت سبک ساختار دیتابیس و بررسی پلن کوئری‌های پرتکرار
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import inspect, text, func, and_, or_, exists, select, update
+from sqlalchemy.orm import aliased
+from models import db, Word, UserWord, ReviewSession
+
+# ایندکس‌هایی که از مدل‌ها حذف شده‌اند و در دیتابیس‌های قدیمی پاک می‌شوند
+OBSOLETE_INDEXES = {
+    # ستون اول uq_words_lemma_article همین جستجو را پوشش می‌دهد
+    'words': ('ix_words_lemma',),
+}
+
+# قید یکتای کلمات که پیش از ساختش تکراری‌ها ادغام می‌شوند
+WORD_KEY_INDEX = 'uq_words_lemma_article'
+
+def upgrade_schema():
+    """
+    هماهنگ کردن دیتابیس موجود با مدل‌ها:
+    ایجاد جداول جدید، افزودن ستون‌های جدید و ایجاد ایندکس‌های تعریف‌شده.
+    خروجی: لیست تغییرات اعمال‌شده
+    """
+    applied = []
+    engine = db.engine
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    
+    db.create_all()
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            applied.append(f'create table {table.name}')
+            continue
+        
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            with engine.begin() as conn:
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            applied.append(f'add column {table.name}.{column.name}')
+        
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for name in OBSOLETE_INDEXES.get(table.name, ()):
+            if name in existing_indexes:
+                with engine.begin() as conn:
+                    conn.execute(text(f'DROP INDEX {name}'))
+                existing_indexes.discard(name)
+                applied.append(f'drop index {name}')
+        if table is Word.__table__:
+            applied += _prepare_word_key(engine, existing_indexes)
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                continue
+            index.create(engine, checkfirst=True)
+            applied.append(f'create index {index.name}')
+    
+    return applied
+
+def _prepare_word_key(engine, existing_indexes):
+    """
+    آماده‌سازی words برای قید یکتای (lemma, article)
+    
+    article خالی (NULL) به '' تبدیل می‌شود، چون NULLها در ایندکس یکتا متمایزند.
+    از هر گروه تکراری کوچک‌ترین شناسه می‌ماند: UserWordهای بقیه به آن منتقل
+    می‌شوند مگر اینکه کاربر آن را داشته باشد، و باقی همراه با لاگ‌ها حذف
+    می‌شوند. اگر قید از قبل با سطرهای NULL ساخته شده باشد، حذف و دوباره ساخته می‌شود.
+    """
+    applied = []
+    with engine.connect() as conn:
+        has_null = conn.execute(select(exists().where(Word.article.is_(None)))).scalar()
+    if WORD_KEY_INDEX in existing_indexes:
+        if not has_null:
+            return applied
+        with engine.begin() as conn:
+            conn.execute(text(f'DROP INDEX {WORD_KEY_INDEX}'))
+        existing_indexes.discard(WORD_KEY_INDEX)
+    
+    if has_null:
+        normalized = db.session.execute(
+            update(Word).where(Word.article.is_(None)).values(article='')
+        ).rowcount
+        applied.append(f'normalize words.article NULL -> \'\' ({normalized} rows)')
+    
+    groups = db.session.query(Word.lemma, Word.article, func.min(Word.id)).group_by(
+        Word.lemma, Word.article
+    ).having(func.count(Word.id) > 1).all()
+    duplicate_ids = []
+    for lemma, article, keep_id in groups:
+        ids = [word_id for (word_id,) in db.session.query(Word.id).filter(
+            Word.lemma == lemma, Word.article == article, Word.id != keep_id)]
+        kept = aliased(UserWord)
+        db.session.execute(
+            update(UserWord)
+            .where(UserWord.word_id.in_(ids))
+            .where(~exists().where(kept.user_id == UserWord.user_id, kept.word_id == keep_id))
+            .values(word_id=keep_id)
+            .execution_options(synchronize_session=False)
+        )
+        duplicate_ids += ids
+    if duplicate_ids:
+        # کلمات تکراری همراه با UserWordهای باقی‌مانده، لاگ‌ها و تمرین‌هایشان حذف می‌شوند
+        from utils.vocabulary_loader import VocabularyLoader
+        VocabularyLoader()._delete_words(duplicate_ids)
+        applied.append(f'merge {len(duplicate_ids)} duplicate words')
+    db.session.commit()
+    return applied
+
+def hot_queries(user_id=1, now=None):
+    """کوئری‌های پرتکرار برنامه به شکلی که در مسیرهای اصلی اجرا می‌شوند"""
+    now = now or datetime.utcnow()
+    return {
+        'due_queue_load': db.session.query(
+            UserWord.id, UserWord.next_review, UserWord.memory_strength
+        ).filter(
+            UserWord.user_id == user_id,
+            UserWord.memory_state != 'mastered'
+        ),
+        'due_count': db.session.query(func.count(UserWord.id)).filter(
+            UserWord.user_id == user_id,
+            UserWord.next_review <= now,
+            UserWord.memory_state != 'mastered'
+        ),
+        'state_count': db.session.query(func.count(UserWord.id)).filter(
+            UserWord.user_id == user_id,
+            UserWord.memory_state == 'new'
+        ),
+        'state_distribution': db.session.query(
+            UserWord.memory_state, func.count(UserWord.id)
+        ).filter(
+            UserWord.user_id == user_id
+        ).group_by(UserWord.memory_state),
+        'weak_words': db.session.query(UserWord).filter(
+            UserWord.user_id == user_id,
+            UserWord.memory_state.in_(['weak', 'learning']),
+            UserWord.next_review <= now
+        ).order_by(UserWord.memory_strength.asc()).limit(20),
+        'new_words_frontier': db.session.query(Word, UserWord.id).outerjoin(
+            UserWord, and_(UserWord.word_id == Word.id, UserWord.user_id == user_id)
+        ).filter(
+            Word.cefr_level == 'A1',
+            Word.lesson == '4',
+            or_(Word.frequency_rank > 1000, and_(Word.frequency_rank == 1000, Word.id >= 1))
+        ).order_by(Word.frequency_rank.asc(), Word.id.asc()).limit(21),
+        'frontier_lessons': db.session.query(Word.lesson).filter(Word.cefr_level == 'A1').distinct(),
+        'words_in_level': db.session.query(func.count(Word.id)).filter(Word.cefr_level == 'A1'),
+        'lemma_lookup': db.session.query(Word.lemma).filter(Word.lemma.in_(['haus', 'buch'])),
+        'recent_sessions': db.session.query(ReviewSession).filter(
+            ReviewSession.user_id == user_id
+        ).order_by(ReviewSession.started_at.desc()).limit(5),
+        'week_sessions': db.session.query(ReviewSession).filter(
+            ReviewSession.user_id == user_id,
+            ReviewSession.started_at >= now - timedelta(days=7)
+        ),
+        'lesson_progress': db.session.query(
+            Word.lesson, func.count(UserWord.id)
+        ).join(
+            UserWord, UserWord.word_id == Word.id
+        ).filter(
+            UserWord.user_id == user_id,
+            Word.lesson.isnot(None)
+        ).group_by(Word.lesson),
+    }
+
+def check_query_plans(user_id=1):
+    """
+    اجرای EXPLAIN QUERY PLAN روی کوئری‌های پرتکرار (فقط SQLite)
+    خروجی: لیست {'name', 'plan', 'full_scan'}؛ full_scan یعنی جدول بدون ایندکس پیمایش شده
+    """
+    results = []
+    for name, query in hot_queries(user_id).items():
+        statement = query.statement.compile(
+            dialect=db.engine.dialect,
+            compile_kwargs={'literal_binds': True}
+        )
+        rows = db.session.execute(text(f'EXPLAIN QUERY PLAN {statement}')).all()
+        plan = [row[-1] for row in rows]
+        full_scan = [
+            detail for detail in plan
+            if detail.startswith('SCAN ') and 'USING' not in detail and 'CONSTANT ROW' not in detail
+        ]
+        results.append({'name': name, 'plan': plan, 'full_scan': full_scan})
+    return results
@@ -0,0 +1,203 @@
+"""
+نگهداری وضعیت جلسه Flask در سمت سرور؛ کوکی فقط یک کلید تصادفی دارد
+
+دو پشتیبان وجود دارد:
+- database: جدول server_sessions در همان دیتابیس برنامه (پیش‌فرض؛ بین پروسه‌ها مشترک)
+- memory: دیکشنری LRU درون‌پروسه‌ای (فقط برای اجرای تک‌پروسه‌ای)
+"""
+import marshal
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from flask.sessions import SessionInterface, SessionMixin
+from sqlalchemy import delete, insert, select
+from werkzeug.datastructures import CallbackDict
+from models import db, ServerSession
+
+# نسخه marshal ثابت نگه داشته می‌شود تا داده‌های ذخیره‌شده بین نسخه‌های پایتون خوانا بمانند
+MARSHAL_VERSION = 4
+
+def encode_session(data):
+    """کدگذاری فشرده دودویی داده جلسه (فقط انواع پایه پایتون)"""
+    return marshal.dumps(dict(data), MARSHAL_VERSION)
+
+def decode_session(raw):
+    """بازگشایی خروجی encode_session؛ داده خراب به جلسه خالی تبدیل می‌شود"""
+    try:
+        data = marshal.loads(raw)
+    except (EOFError, ValueError, TypeError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+class StoredSession(CallbackDict, SessionMixin):
+    """جلسه‌ای که با کلید key در store ذخیره می‌شود"""
+    
+    def __init__(self, initial=None, key=None, new=False, expires_at=None):
+        def on_update(self):
+            self.modified = True
+        
+        super().__init__(initial, on_update)
+        self.key = key
+        self.new = new
+        self.expires_at = expires_at
+        # کاربر واردشده هنگام بازکردن جلسه؛ با تغییرش کلید عوض می‌شود
+        self.loaded_user_id = self.get('_user_id')
+        self.modified = False
+
+class MemorySessionStore:
+    """پشتیبان LRU درون‌پروسه‌ای با انقضای زمانی"""
+    
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def load(self, key, now):
+        """(داده، زمان انقضا) یا None اگر وجود نداشته یا منقضی شده باشد"""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            if item[1] <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return item
+    
+    def save(self, key, raw, expires_at):
+        with self._lock:
+            self._entries[key] = (raw, expires_at)
+            self._entries.move_to_end(key)
+            self._evict(time.time())
+    
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def _evict(self, now):
+        """حذف قدیمی‌ترین جلسه‌ها وقتی منقضی شده‌اند یا ظرفیت پر است"""
+        while self._entries:
+            key, (_, expires_at) = next(iter(self._entries.items()))
+            if expires_at > now and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[key]
+
+class DatabaseSessionStore:
+    """
+    پشتیبان جدول server_sessions؛ بین پروسه‌ها مشترک است
+    
+    با اتصال‌های جداگانه db.engine و بیرون از db.session درخواست کار می‌کند:
+    نوشتن جلسه تراکنش خودش را دارد و با rollback درخواست برنمی‌گردد.
+    """
+    
+    # فاصله (ثانیه) بین پاک‌سازی جلسه‌های منقضی
+    PURGE_INTERVAL = 300
+    
+    def __init__(self):
+        self._purged_at = 0.0
+    
+    def load(self, key, now):
+        table = ServerSession.__table__
+        with db.engine.connect() as conn:
+            row = conn.execute(
+                select(table.c.data, table.c.expires_at).where(table.c.key == key)
+            ).first()
+        if row is None or row.expires_at <= now:
+            return None
+        return row.data, row.expires_at
+    
+    def save(self, key, raw, expires_at):
+        table = ServerSession.__table__
+        with db.engine.begin() as conn:
+            conn.execute(delete(table).where(table.c.key == key))
+            conn.execute(insert(table).values(key=key, data=raw, expires_at=expires_at))
+            
+            now = time.time()
+            if now - self._purged_at > self.PURGE_INTERVAL:
+                conn.execute(delete(table).where(table.c.expires_at <= now))
+                self._purged_at = now
+    
+    def delete(self, key):
+        table = ServerSession.__table__
+        with db.engine.begin() as conn:
+            conn.execute(delete(table).where(table.c.key == key))
+
+class ServerSideSessionInterface(SessionInterface):
+    """SessionInterface که داده را در store و فقط کلید را در کوکی نگه می‌دارد"""
+    
+    def __init__(self, store, ttl=86400):
+        self.store = store
+        self.ttl = ttl
+    
+    def open_session(self, app, request):
+        now = time.time()
+        key = request.cookies.get(self.get_cookie_name(app))
+        if key:
+            item = self.store.load(key, now)
+            if item is not None:
+                raw, expires_at = item
+                stored = StoredSession(decode_session(raw), key=key, expires_at=expires_at)
+                # تمدید انقضا وقتی نیمی از TTL گذشته، بدون نوشتن در هر درخواست
+                if expires_at - now < self.ttl / 2:
+                    stored.modified = True
+                return stored
+        return StoredSession(key=secrets.token_urlsafe(32), new=True)
+    
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        
+        if session.accessed:
+            response.vary.add('Cookie')
+        
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.key)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        
+        if session.get('_user_id') != session.loaded_user_id and not session.new:
+            # ورود یا خروج: کلید قبلی (که ممکن است پیش از ورود به کاربر داده شده
+            # باشد) حذف و کلید تازه صادر می‌شود تا جلسه قابل تثبیت نباشد
+            self.store.delete(session.key)
+            session.key = secrets.token_urlsafe(32)
+            session.modified = True
+        
+        if not session.modified:
+            return
+        
+        self.store.save(session.key, encode_session(session), time.time() + self.ttl)
+        response.set_cookie(
+            name,
+            session.key,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+
+def create_session_interface(app):
+    """
+    ساخت SessionInterface بر اساس SESSION_STORE ('database' یا 'memory')
+    
+    پشتیبان memory جلسه را فقط در همان پروسه نگه می‌دارد؛ با چند worker
+    درخواست بعدی به پروسه دیگری می‌رسد و کاربر خارج می‌شود، پس در این حالت
+    برنامه اصلاً بالا نمی‌آید.
+    """
+    backend = app.config.get('SESSION_STORE', 'database')
+    if backend == 'database':
+        store = DatabaseSessionStore()
+    elif backend == 'memory':
+        workers = app.config.get('WORKERS', 1)
+        if workers > 1:
+            raise ValueError(
+                f'پشتیبان جلسه memory با {workers} worker کار نمی‌کند؛ SESSION_STORE=database را به کار ببرید'
+            )
+        store = MemorySessionStore(app.config.get('SESSION_STORE_MAX_ENTRIES', 10000))
+    else:
+        raise ValueError(f'پشتیبان جلسه ناشناخته: {backend}')
+    return ServerSideSessionInterface(store, ttl=app.config.get('SESSION_TTL', 86400))
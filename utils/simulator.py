@@ -0,0 +1,249 @@
+"""
+شبیه‌ساز بازپخش مرورها برای سنجش هزینه تغییرات الگوریتم تکرار فاصله‌دار
+
+دو حالت دارد:
+- replay: بازپخش ReviewLogهای واقعی از یک کپی دیتابیس
+- synthetic: تولید N کاربر مصنوعی برای M روز شبیه‌سازی‌شده
+
+هر دو حالت روی یک دیتابیس SQLite در حافظه اجرا می‌شوند تا دیتابیس اصلی دست نخورد.
+"""
+import math
+import random
+import sqlite3
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from flask import Flask
+from sqlalchemy import event, func
+from models import db, User, Word, UserWord, ReviewLog
+from spaced_repetition import SpacedRepetitionEngine
+
+def create_simulation_app(source_db=None):
+    """ساخت یک اپ Flask روی SQLite در حافظه (اختیاری: کپی از source_db)"""
+    app = Flask('solingo_simulator')
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    
+    with app.app_context():
+        if source_db:
+            # کپی کامل فایل دیتابیس به اتصال در حافظه
+            source = sqlite3.connect(f'file:{source_db}?mode=ro', uri=True)
+            target = db.engine.raw_connection()
+            try:
+                source.backup(target.driver_connection)
+            finally:
+                source.close()
+                target.close()
+        db.create_all()
+        
+        if Word.query.count() == 0:
+            from utils.vocabulary_loader import VocabularyLoader
+            VocabularyLoader().load_all_files(bulk=True)
+    
+    return app
+
+class QueryCounter:
+    """شمارش دستورات SQL اجرا شده روی engine"""
+    
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+    
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+    
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+    
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+def recall_probability(strength, elapsed_hours, skill):
+    """مدل ساده فراموشی: پایداری از ۱ تا ۱۶ روز بر اساس قدرت حافظه"""
+    stability_hours = 24 * 2 ** (strength * 4)
+    return skill * math.exp(-elapsed_hours / stability_hours)
+
+def run_synthetic(users=20, days=30, new_per_day=5, session_size=10, seed=42, start=None):
+    """
+    شبیه‌سازی کاربران مصنوعی با مسیر واقعی get_due_words و calculate_review
+    
+    هر کاربر روزی یک جلسه دارد: کلمات موعد مرور (حداکثر session_size) به
+    علاوه حداکثر new_per_day کلمه جدید. پاسخ‌ها با recall_probability
+    تولید می‌شوند.
+    """
+    rng = random.Random(seed)
+    start = start or datetime(2025, 1, 1, 8, 0)
+    engine = SpacedRepetitionEngine
+    
+    word_ids = [word_id for (word_id,) in db.session.query(Word.id).order_by(Word.id)]
+    if not word_ids:
+        raise ValueError('هیچ کلمه‌ای برای شبیه‌سازی وجود ندارد')
+    
+    profiles = {}
+    for index in range(users):
+        user = User(username=f'sim_user_{seed}_{index}', email=f'sim_{seed}_{index}@example.com')
+        db.session.add(user)
+        db.session.flush()
+        profiles[user.id] = {'skill': rng.uniform(0.7, 1.0), 'next_word': 0}
+    db.session.commit()
+    
+    per_day = []
+    scheduler_time = 0.0
+    total_reviews = 0
+    started = time.perf_counter()
+    
+    with QueryCounter(db.engine) as queries:
+        for day in range(days):
+            day_start = start + timedelta(days=day)
+            queries_before = queries.count
+            due_sizes = []
+            reviews = 0
+            correct = 0
+            predicted = 0.0
+            
+            for user_id, profile in profiles.items():
+                now = day_start + timedelta(minutes=rng.randint(0, 600))
+                
+                due_sizes.append(UserWord.query.filter(
+                    UserWord.user_id == user_id,
+                    UserWord.next_review <= now,
+                    UserWord.memory_state != 'mastered'
+                ).count())
+                session_words = engine.get_due_words(user_id, limit=session_size, now=now)
+                
+                # معرفی کلمات جدید به ترتیب ثابت
+                for _ in range(min(new_per_day, session_size - len(session_words))):
+                    if profile['next_word'] >= len(word_ids):
+                        break
+                    user_word = UserWord(
+                        user_id=user_id,
+                        word_id=word_ids[profile['next_word']],
+                        memory_strength=0.0,
+                        memory_state='new',
+                        first_seen=now,
+                        next_review=now,
+                        total_reviews=0,
+                        correct_reviews=0,
+                        consecutive_correct=0,
+                        avg_response_time=0.0,
+                        decay_rate=0.3
+                    )
+                    profile['next_word'] += 1
+                    db.session.add(user_word)
+                    session_words.append(user_word)
+                # شناسه لازم است تا calculate_review صف موعد مرور را بروز کند
+                db.session.flush()
+                
+                for user_word in session_words:
+                    last_seen = user_word.last_reviewed or user_word.first_seen or now
+                    elapsed_hours = (now - last_seen).total_seconds() / 3600
+                    probability = recall_probability(user_word.memory_strength, elapsed_hours, profile['skill'])
+                    is_correct = rng.random() < probability
+                    response_time = rng.lognormvariate(1.3, 0.5)
+                    
+                    tick = time.perf_counter()
+                    engine.calculate_review(user_word, is_correct, response_time, now=now)
+                    scheduler_time += time.perf_counter() - tick
+                    
+                    reviews += 1
+                    correct += is_correct
+                    predicted += probability
+                
+                db.session.commit()
+            
+            total_reviews += reviews
+            per_day.append(_day_report(day, due_sizes, reviews, correct, predicted, queries.count - queries_before))
+    
+    return _report('synthetic', total_reviews, scheduler_time, time.perf_counter() - started, queries.count, per_day)
+
+def run_replay(limit=None):
+    """
+    بازپخش ReviewLogها به ترتیب زمانی روی وضعیت‌های تازه در حافظه
+    
+    وضعیت هر user_word از صفر شروع می‌شود و فقط از طریق calculate_review
+    تغییر می‌کند، بنابراین اثر تغییر فرمول‌ها روی همان تاریخچه دیده می‌شود.
+    """
+    engine = SpacedRepetitionEngine
+    
+    with QueryCounter(db.engine) as queries:
+        query = db.session.query(
+            ReviewLog.user_word_id,
+            ReviewLog.timestamp,
+            ReviewLog.was_correct,
+            ReviewLog.response_time
+        ).order_by(ReviewLog.timestamp.asc(), ReviewLog.id.asc())
+        if limit:
+            query = query.limit(limit)
+        logs = query.all()
+    
+    states = {}
+    by_day = defaultdict(lambda: {'reviews': 0, 'correct': 0})
+    scheduler_time = 0.0
+    started = time.perf_counter()
+    
+    for user_word_id, timestamp, was_correct, response_time in logs:
+        state = states.get(user_word_id)
+        if state is None:
+            state = states[user_word_id] = UserWord(
+                memory_strength=0.0,
+                memory_state='new',
+                first_seen=timestamp,
+                next_review=timestamp,
+                total_reviews=0,
+                correct_reviews=0,
+                consecutive_correct=0,
+                avg_response_time=0.0,
+                decay_rate=0.3
+            )
+        
+        tick = time.perf_counter()
+        engine.calculate_review(state, bool(was_correct), response_time or 0.0, now=timestamp)
+        scheduler_time += time.perf_counter() - tick
+        
+        day = by_day[timestamp.date()]
+        day['reviews'] += 1
+        day['correct'] += bool(was_correct)
+    
+    per_day = []
+    for index, day in enumerate(sorted(by_day)):
+        day_end = datetime.combine(day, datetime.max.time())
+        due = sum(1 for state in states.values()
+                  if state.next_review <= day_end and state.memory_state != 'mastered')
+        stats = by_day[day]
+        per_day.append(_day_report(index, [due], stats['reviews'], stats['correct'], None, 0, date=day.isoformat()))
+    
+    return _report('replay', len(logs), scheduler_time, time.perf_counter() - started, queries.count, per_day)
+
+def _day_report(day, due_sizes, reviews, correct, predicted, queries, date=None):
+    """خلاصه یک روز شبیه‌سازی"""
+    return {
+        'day': day,
+        'date': date,
+        'due_mean': round(sum(due_sizes) / len(due_sizes), 2) if due_sizes else 0,
+        'due_max': max(due_sizes) if due_sizes else 0,
+        'reviews': reviews,
+        'retention': round(correct / reviews, 3) if reviews else None,
+        'predicted_recall': round(predicted / reviews, 3) if reviews and predicted is not None else None,
+        'queries': queries
+    }
+
+def _report(mode, reviews, scheduler_time, wall_time, queries, per_day):
+    """گزارش نهایی شبیه‌سازی"""
+    total_correct = sum((day['retention'] or 0) * day['reviews'] for day in per_day)
+    return {
+        'mode': mode,
+        'reviews': reviews,
+        'scheduler_seconds': round(scheduler_time, 4),
+        'scheduler_reviews_per_sec': round(reviews / scheduler_time) if scheduler_time > 0 else None,
+        'wall_seconds': round(wall_time, 3),
+        'queries': queries,
+        'queries_per_review': round(queries / reviews, 2) if reviews else None,
+        'retention': round(total_correct / reviews, 3) if reviews else None,
+        'per_day': per_day
+    }
+
+def count_review_logs():
+    """تعداد ReviewLogهای موجود برای بازپخش"""
+    return db.session.query(func.count(ReviewLog.id)).scalar()
@@ -0,0 +1,236 @@
+"""
+تنظیمات اتصال SQLite و سنجش رقابت خواننده/نویسنده
+
+apply_sqlite_pragmas دستورات PRAGMA را روی هر اتصال جدید engine اجرا می‌کند.
+run_contention_benchmark بار همزمان شبیه submit_answer (نویسنده) و شروع جلسه
+(خواننده) را روی یک دیتابیس موقت اجرا کرده و صدک‌های تأخیر را گزارش می‌دهد.
+"""
+import math
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event, func, insert, inspect, select, update
+from sqlalchemy.exc import OperationalError
+from models import db, User, Word, UserWord, ReviewSession, ReviewLog
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """اجرای pragmas (نگاشت نام به مقدار) روی هر اتصال جدید؛ برای غیر SQLite کاری نمی‌کند"""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+    
+    statements = [f'PRAGMA {name}={value}' for name, value in pragmas.items()]
+    
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+    
+    event.listen(engine, 'connect', on_connect)
+
+def read_pragmas(engine, names):
+    """مقدار فعلی چند PRAGMA روی یک اتصال از engine"""
+    with engine.connect() as conn:
+        return {name: conn.exec_driver_sql(f'PRAGMA {name}').scalar() for name in names}
+
+def run_contention_benchmark(pragmas, writers=4, readers=8, duration=5.0, users=50,
+                             words=2000, words_per_user=200, think_ms=10, seed=42, engine_options=None,
+                             url=None):
+    """
+    اجرای بار همزمان روی یک دیتابیس فایلی موقت با pragmas داده‌شده
+    
+    هر خواننده و نویسنده یک پروسه جدا با engine و اتصال خودش است، مانند
+    workerهای جدای gunicorn، تا رقابت روی قفل فایل دیتابیس سنجیده شود و نه
+    روی GIL. هر نویسنده مانند submit_answer یک UserWord را بروز کرده، یک
+    ReviewLog می‌نویسد و شمارنده‌های جلسه را در یک تراکنش افزایش می‌دهد. هر
+    خواننده مانند شروع جلسه کلمات سررسید یک کاربر و تعداد آنها به تفکیک وضعیت
+    را می‌خواند. بین دو عملیات هر پروسه به طور میانگین think_ms میلی‌ثانیه مکث
+    می‌کند تا تأخیر ناشی از قفل دیتابیس از رقابت پروسه‌ها بر سر CPU جدا شود.
+    
+    با url (مثلاً یک PostgreSQL موقت) همین بار روی آن دیتابیس اجرا می‌شود؛
+    دیتابیس باید خالی باشد و جداول در پایان حذف می‌شوند.
+    """
+    path = None
+    if url is None:
+        handle, path = tempfile.mkstemp(suffix='.db', prefix='solingo-bench-')
+        os.close(handle)
+        url = f'sqlite:///{path}'
+    options = {'pool_size': 1, 'max_overflow': 0}
+    options.update(engine_options or {})
+    engine = create_engine(url, **options)
+    apply_sqlite_pragmas(engine, pragmas)
+    if path is None and inspect(engine).has_table(User.__tablename__):
+        engine.dispose()
+        raise ValueError(f'دیتابیس سنجش باید خالی باشد: {engine.url!r}')
+    
+    try:
+        session_ids, user_word_count = _seed(engine, users, words, words_per_user, seed)
+        engine.dispose()
+        
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        stop = context.Event()
+        start = context.Barrier(writers + readers + 1)
+        settings = (engine.url.render_as_string(hide_password=False), options, pragmas,
+                    session_ids, user_word_count, think_ms, start, stop, results)
+        processes = [
+            context.Process(target=_worker, args=('write', seed + index) + settings)
+            for index in range(writers)
+        ] + [
+            context.Process(target=_worker, args=('read', seed + writers + index) + settings)
+            for index in range(readers)
+        ]
+        for process in processes:
+            process.start()
+        start.wait()
+        began = time.perf_counter()
+        time.sleep(duration)
+        stop.set()
+        
+        latencies = {'read': [], 'write': []}
+        errors = {'read': 0, 'write': 0}
+        for _ in processes:
+            kind, own_latencies, own_errors = results.get()
+            latencies[kind].extend(own_latencies)
+            errors[kind] += own_errors
+        elapsed = time.perf_counter() - began
+        for process in processes:
+            process.join()
+        
+        report = {'dialect': engine.dialect.name, 'processes': len(processes)}
+        if engine.dialect.name == 'sqlite':
+            report['pragmas'] = read_pragmas(engine, ('journal_mode', 'synchronous', 'busy_timeout'))
+        for kind in ('read', 'write'):
+            values = sorted(latencies[kind])
+            report[kind] = {
+                'ops': len(values),
+                'ops_per_sec': round(len(values) / elapsed),
+                'errors': errors[kind],
+                'p50_ms': _percentile_ms(values, 50),
+                'p95_ms': _percentile_ms(values, 95),
+                'p99_ms': _percentile_ms(values, 99),
+                'max_ms': _percentile_ms(values, 100)
+            }
+        return report
+    finally:
+        if path is None:
+            db.metadata.drop_all(engine)
+        engine.dispose()
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if path and os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+def _worker(kind, worker_seed, url, options, pragmas, session_ids, user_word_count, think_ms, start, stop, results):
+    """یک پروسه خواننده یا نویسنده با engine خودش؛ تأخیرها در پایان در results گذاشته می‌شوند"""
+    engine = create_engine(url, **options)
+    apply_sqlite_pragmas(engine, pragmas)
+    operation = _write_answer if kind == 'write' else _read_due_words
+    rng = random.Random(worker_seed)
+    latencies = []
+    errors = 0
+    try:
+        start.wait()
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                operation(engine, rng, session_ids, user_word_count)
+            except OperationalError:
+                # database is locked پس از پایان busy_timeout
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            if think_ms:
+                time.sleep(rng.expovariate(1000 / think_ms))
+    finally:
+        engine.dispose()
+        results.put((kind, latencies, errors))
+
+def _seed(engine, users, words, words_per_user, seed):
+    """ساخت جداول و داده مصنوعی؛ خروجی: (شناسه جلسه هر کاربر، تعداد UserWordها)"""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    db.metadata.create_all(engine)
+    
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {'id': index, 'username': f'bench{index}', 'email': f'bench{index}@example.com'}
+            for index in range(1, users + 1)
+        ])
+        conn.execute(insert(Word), [
+            {'id': index, 'lemma': f'Wort{index}', 'persian_translation': f'واژه{index}', 'cefr_level': 'A1'}
+            for index in range(1, words + 1)
+        ])
+        rows = []
+        for user_id in range(1, users + 1):
+            for word_id in rng.sample(range(1, words + 1), min(words_per_user, words)):
+                rows.append({
+                    'user_id': user_id,
+                    'word_id': word_id,
+                    'memory_state': rng.choice(('new', 'learning', 'weak', 'strong', 'mastered')),
+                    'next_review': now + timedelta(hours=rng.uniform(-48, 48))
+                })
+        conn.execute(insert(UserWord), rows)
+        conn.execute(insert(ReviewSession), [
+            {'id': user_id, 'user_id': user_id, 'session_type': 'mixed', 'started_at': now}
+            for user_id in range(1, users + 1)
+        ])
+    return list(range(1, users + 1)), len(rows)
+
+def _write_answer(engine, rng, session_ids, user_word_count):
+    """معادل نوشتن‌های submit_answer در یک تراکنش"""
+    user_word_id = rng.randint(1, user_word_count)
+    session_id = rng.choice(session_ids)
+    correct = rng.random() < 0.7
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(update(UserWord).where(UserWord.id == user_word_id).values(
+            memory_strength=rng.random(),
+            total_reviews=UserWord.total_reviews + 1,
+            last_reviewed=now,
+            next_review=now + timedelta(days=rng.randint(1, 30))
+        ))
+        conn.execute(insert(ReviewLog).values(
+            session_id=session_id,
+            user_word_id=user_word_id,
+            exercise_type='multiple_choice',
+            response_time=rng.uniform(1, 10),
+            was_correct=correct,
+            timestamp=now
+        ))
+        conn.execute(update(ReviewSession).where(ReviewSession.id == session_id).values(
+            total_questions=ReviewSession.total_questions + 1,
+            total_correct=ReviewSession.total_correct + int(correct)
+        ))
+
+def _read_due_words(engine, rng, session_ids, user_word_count):
+    """معادل خواندن‌های شروع جلسه: کلمات سررسید و شمارش وضعیت‌ها"""
+    user_id = rng.choice(session_ids)
+    with engine.connect() as conn:
+        conn.execute(
+            select(UserWord.id, Word.lemma, Word.persian_translation)
+            .join(Word, Word.id == UserWord.word_id)
+            .where(
+                UserWord.user_id == user_id,
+                UserWord.next_review <= datetime.utcnow(),
+                UserWord.memory_state != 'mastered'
+            )
+            .order_by(UserWord.next_review)
+            .limit(20)
+        ).all()
+        conn.execute(
+            select(UserWord.memory_state, func.count(UserWord.id))
+            .where(UserWord.user_id == user_id)
+            .group_by(UserWord.memory_state)
+        ).all()
+
+def _percentile_ms(sorted_values, percent):
+    """صدک percent از مقادیر مرتب (ثانیه) به میلی‌ثانیه"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values), max(1, math.ceil(percent / 100 * len(sorted_values)))) - 1
+    return round(sorted_values[index] * 1000, 2)
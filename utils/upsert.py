@@ -0,0 +1,80 @@
+"""
+درج بدون تکرار (INSERT ... ON CONFLICT DO NOTHING) برای SQLite و PostgreSQL
+
+به جای «اول بررسی، بعد درج» که دو رفت‌وبرگشت دارد و در اجرای همزمان با
+قید یکتا برخورد می‌کند، تکراری‌ها در خود دیتابیس نادیده گرفته می‌شوند.
+در PostgreSQL درج انبوه با COPY در یک جدول موقت و سپس INSERT ... SELECT
+انجام می‌شود (نیازمند psycopg2؛ requirements-postgres.txt).
+"""
+import io
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db
+
+_DIALECT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+def insert_ignore(target, conflict_columns):
+    """دستور insert روی مدل یا جدول target که سطرهای تکراری conflict_columns را رد می‌کند
+    
+    برای dialectهای دیگر یک insert ساده برمی‌گردد.
+    """
+    factory = _DIALECT_INSERTS.get(db.engine.dialect.name)
+    if factory is None:
+        return insert(target)
+    return factory(target).on_conflict_do_nothing(index_elements=list(conflict_columns))
+
+def bulk_insert_ignore(model, rows, conflict_columns, batch_size=500):
+    """درج انبوه سطرها (دیکشنری ستون به مقدار) بدون تکراری‌ها؛ خروجی: تعداد سطرهای درج‌شده"""
+    if not rows:
+        return 0
+    table = model.__table__
+    if db.engine.dialect.name == 'postgresql':
+        return _copy_insert(table, rows, conflict_columns)
+    
+    statement = insert_ignore(table, conflict_columns)
+    inserted = 0
+    for start in range(0, len(rows), batch_size):
+        inserted += db.session.execute(statement, rows[start:start + batch_size]).rowcount
+    return inserted
+
+def _copy_insert(table, rows, conflict_columns):
+    """COPY سطرها به جدول موقت و انتقال آنها با ON CONFLICT DO NOTHING در همان تراکنش"""
+    names = list(rows[0])
+    columns = ', '.join(names)
+    staging = f'copy_{table.name}'
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_text(row[name]) for name in names))
+        buffer.write('\n')
+    buffer.seek(0)
+    
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.execute(
+            f'CREATE TEMP TABLE IF NOT EXISTS {staging} '
+            f'(LIKE {table.name} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS'
+        )
+        cursor.execute(f'TRUNCATE {staging}')
+        cursor.copy_expert(f'COPY {staging} ({columns}) FROM STDIN', buffer)
+        cursor.execute(
+            f'INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {staging} '
+            f'ON CONFLICT ({", ".join(conflict_columns)}) DO NOTHING'
+        )
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+def _copy_text(value):
+    """مقدار یک ستون در قالب متنی COPY"""
+    if value is None:
+        return '\\N'
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
@@ -0,0 +1,338 @@
+"""
+آمار تجمیعی کلمات کاربر
+"""
+import json
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import case, func, update
+from models import db, User, UserWord, ReviewSession, UserStats
+from spaced_repetition import STATES
+
+# کلید سطلی که ساعت‌های گذشته در آن ادغام می‌شوند
+OVERDUE_BUCKET = 'overdue'
+
+# تعداد روزهایی که فعالیت روزانه نگهداری می‌شود
+ACTIVITY_DAYS = 90
+
+def get_user_word_summary(user_id, now=None):
+    """
+    توزیع وضعیت‌ها، تعداد کلمات موعد مرور و مجموع کلمات کاربر با یک کوئری
+    
+    خروجی: {'total', 'due', 'mastered', 'distribution': {state: count}}
+    """
+    now = now or datetime.utcnow()
+    due = case(
+        ((UserWord.next_review <= now) & (UserWord.memory_state != 'mastered'), 1),
+        else_=0
+    )
+    rows = db.session.query(
+        UserWord.memory_state,
+        func.count(UserWord.id),
+        func.sum(due)
+    ).filter(
+        UserWord.user_id == user_id
+    ).group_by(
+        UserWord.memory_state
+    ).all()
+    
+    distribution = {state: 0 for state in STATES}
+    due_count = 0
+    for state, count, state_due in rows:
+        distribution[state] = distribution.get(state, 0) + count
+        due_count += state_due or 0
+    
+    return {
+        'total': sum(distribution.values()),
+        'due': due_count,
+        'mastered': distribution['mastered'],
+        'distribution': distribution
+    }
+
+# ===== جدول user_stats =====
+def get_user_stats(user_id, for_update=False):
+    """
+    ردیف آمار کاربر با کلید اصلی؛ اگر وجود ندارد از روی داده‌ها ساخته می‌شود
+    
+    در مسیرهای خواندن ردیف ساخته‌شده به session اضافه نمی‌شود تا نماهای
+    فقط‌خواندنی چیزی ننویسند؛ با for_update=True ردیف درج و flush می‌شود و
+    commit با درخواست فراخواننده است.
+    
+    due_buckets و daily_activity به صورت خواندن-تغییر-نوشتن JSON بروز می‌شوند؛
+    مسیرهای نوشتن با for_update=True ردیف را پیش از خواندن قفل می‌کنند تا
+    درخواست‌های همزمان یک کاربر پشت هم اجرا شوند و تغییری از دست نرود.
+    ساخت همزمان ردیفی که هنوز وجود ندارد در یکی از درخواست‌ها با خطای
+    کلید تکراری متوقف می‌شود.
+    """
+    if for_update:
+        # UPDATE بی‌اثر: قفل ردیف در PostgreSQL و قفل نوشتن در SQLite (که
+        # SELECT ... FOR UPDATE ندارد) تا پایان تراکنش نگه داشته می‌شود
+        locked = db.session.execute(
+            update(UserStats)
+            .where(UserStats.user_id == user_id)
+            .values(updated_at=UserStats.updated_at)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if locked:
+            return db.session.get(UserStats, user_id, populate_existing=True)
+    stats = db.session.get(UserStats, user_id)
+    if stats is None:
+        if for_update:
+            return rebuild_user_stats(user_id)
+        stats = UserStats(user_id=user_id)
+        _fill_user_stats(stats, datetime.utcnow())
+    return stats
+
+def stats_summary(stats, now=None):
+    """
+    خلاصه‌ای هم‌شکل با get_user_word_summary از روی ردیف user_stats
+    
+    سطل‌های ساعت‌های گذشته کامل موعد مرورند؛ سطل ساعت جاری فقط تا now موعد
+    دارد، پس به جای آن یک کوئری محدود به همان ساعت (روی ایندکس user_id و
+    next_review) شمرده می‌شود تا عدد داشبورد با get_due_words یکی باشد.
+    """
+    now = now or datetime.utcnow()
+    distribution = {state: getattr(stats, f'{state}_count') or 0 for state in STATES}
+    buckets = json.loads(stats.due_buckets or '{}')
+    
+    current_hour = _bucket_key(now)
+    day_later = _bucket_key(now + timedelta(hours=24))
+    week_later = _bucket_key(now + timedelta(days=7))
+    due_now = buckets.get(OVERDUE_BUCKET, 0)
+    due_24h = 0
+    due_7d = 0
+    for key, count in buckets.items():
+        if key == OVERDUE_BUCKET:
+            continue
+        if key == current_hour:
+            due_in_hour = _count_due_in_hour(stats.user_id, now) if count else 0
+            due_now += due_in_hour
+            due_24h += max(0, count - due_in_hour)
+        elif key < current_hour:
+            due_now += count
+        elif key <= day_later:
+            due_24h += count
+        elif key <= week_later:
+            due_7d += count
+    
+    return {
+        'total': sum(distribution.values()),
+        'due': due_now,
+        'mastered': distribution['mastered'],
+        'distribution': distribution,
+        'due_soon': {
+            'now': due_now,
+            'next_24h': due_24h,
+            'next_7d': due_7d
+        }
+    }
+
+def stats_recent_activity(stats, days=7, now=None):
+    """آمار جلسات چند روز اخیر هم‌شکل با خروجی /session_stats"""
+    now = now or datetime.utcnow()
+    since = (now - timedelta(days=days)).date().isoformat()
+    activity = json.loads(stats.daily_activity or '{}')
+    
+    recent = {date: day for date, day in activity.items() if date >= since}
+    total_correct = sum(day['correct'] for day in recent.values())
+    total_questions = sum(day['questions'] for day in recent.values())
+    
+    return {
+        'total_sessions': sum(day['sessions'] for day in recent.values()),
+        'total_words_learned': sum(day['learned'] for day in recent.values()),
+        'total_words_reviewed': sum(day['reviewed'] for day in recent.values()),
+        'accuracy': round((total_correct / total_questions) * 100, 1) if total_questions else 0,
+        'daily_activity': {
+            date: {
+                'sessions': day['sessions'],
+                'words': day['learned'] + day['reviewed'],
+                'accuracy': round((day['correct'] / day['questions']) * 100, 1) if day['questions'] else 0
+            }
+            for date, day in sorted(recent.items())
+        },
+        'lifetime': {
+            'sessions': stats.total_sessions,
+            'questions': stats.total_questions,
+            'correct': stats.total_correct
+        }
+    }
+
+def record_new_words(stats, user_words, now=None):
+    """ثبت کلمات تازه ایجادشده کاربر در آمار (در همان تراکنش)"""
+    buckets = _load_buckets(stats, now)
+    for user_word in user_words:
+        stats.new_count = (stats.new_count or 0) + 1
+        key = _bucket_key(user_word.next_review or now or datetime.utcnow())
+        buckets[key] = buckets.get(key, 0) + 1
+    _store_buckets(stats, buckets)
+
+def record_review(stats, old_state, old_next_review, user_word, is_correct, now=None):
+    """اعمال نتیجه یک مرور روی آمار (در همان تراکنش submit_answer)"""
+    now = now or datetime.utcnow()
+    new_state = user_word.memory_state
+    
+    # جابه‌جایی بین وضعیت‌ها
+    if old_state in STATES:
+        _increment(stats, f'{old_state}_count', -1)
+    _increment(stats, f'{new_state}_count', 1)
+    
+    # جابه‌جایی بین سطل‌های زمان مرور
+    buckets = _load_buckets(stats, now)
+    if old_state != 'mastered' and old_next_review is not None:
+        key = _bucket_key(old_next_review)
+        if key not in buckets:
+            key = OVERDUE_BUCKET
+        _decrement_bucket(buckets, key)
+    if new_state != 'mastered':
+        key = _bucket_key(user_word.next_review)
+        buckets[key] = buckets.get(key, 0) + 1
+    _store_buckets(stats, buckets)
+    
+    learned = new_state == 'new'
+    _increment(stats, 'total_questions', 1)
+    _increment(stats, 'total_correct', 1 if is_correct else 0)
+    _increment(stats, 'words_learned' if learned else 'words_reviewed', 1)
+    
+    _record_activity(stats, now, questions=1, correct=1 if is_correct else 0,
+                     learned=1 if learned else 0, reviewed=0 if learned else 1)
+
+def record_session(stats, started_at=None):
+    """ثبت شروع یک جلسه جدید در آمار"""
+    _increment(stats, 'total_sessions', 1)
+    _record_activity(stats, started_at or datetime.utcnow(), sessions=1)
+
+def rebuild_user_stats(user_id=None, now=None):
+    """
+    محاسبه کامل user_stats از روی user_words و review_sessions
+    
+    با user_id فقط همان کاربر بازسازی و ردیفش برگردانده می‌شود؛ بدون آن
+    همه کاربران بازسازی می‌شوند و تعداد کاربران برگردانده می‌شود. تغییرات
+    فقط flush می‌شوند؛ commit با فراخواننده است (مثلاً manage.py rebuild-stats).
+    """
+    now = now or datetime.utcnow()
+    user_ids = [user_id] if user_id is not None else [uid for (uid,) in db.session.query(User.id)]
+    stats = None
+    
+    for uid in user_ids:
+        stats = db.session.get(UserStats, uid)
+        if stats is None:
+            stats = UserStats(user_id=uid)
+            db.session.add(stats)
+        _fill_user_stats(stats, now)
+    
+    db.session.flush()
+    return stats if user_id is not None else len(user_ids)
+
+def _fill_user_stats(stats, now):
+    """محاسبه همه ستون‌های ردیف آمار stats.user_id از روی user_words و review_sessions"""
+    uid = stats.user_id
+    counts = Counter()
+    buckets = {}
+    for state, next_review in db.session.query(
+            UserWord.memory_state, UserWord.next_review).filter(UserWord.user_id == uid):
+        counts[state] += 1
+        if state != 'mastered':
+            key = _bucket_key(next_review or now)
+            buckets[key] = buckets.get(key, 0) + 1
+    
+    for state in STATES:
+        setattr(stats, f'{state}_count', counts[state])
+    _store_buckets(stats, _fold_buckets(buckets, now))
+    
+    totals = Counter()
+    activity = {}
+    since = (now - timedelta(days=ACTIVITY_DAYS)).date().isoformat()
+    for started_at, learned, reviewed, correct, questions in db.session.query(
+            ReviewSession.started_at,
+            ReviewSession.words_learned,
+            ReviewSession.words_reviewed,
+            ReviewSession.total_correct,
+            ReviewSession.total_questions).filter(ReviewSession.user_id == uid):
+        totals['sessions'] += 1
+        totals['learned'] += learned or 0
+        totals['reviewed'] += reviewed or 0
+        totals['correct'] += correct or 0
+        totals['questions'] += questions or 0
+        
+        date = (started_at or now).date().isoformat()
+        if date < since:
+            continue
+        day = activity.setdefault(date, _empty_day())
+        day['sessions'] += 1
+        day['learned'] += learned or 0
+        day['reviewed'] += reviewed or 0
+        day['correct'] += correct or 0
+        day['questions'] += questions or 0
+    
+    stats.total_sessions = totals['sessions']
+    stats.words_learned = totals['learned']
+    stats.words_reviewed = totals['reviewed']
+    stats.total_correct = totals['correct']
+    stats.total_questions = totals['questions']
+    stats.daily_activity = json.dumps(activity)
+    stats.updated_at = now
+
+def invalidate_user_stats(user_ids):
+    """حذف ردیف آمار کاربران تا در خواندن بعدی دوباره ساخته شود"""
+    db.session.query(UserStats).filter(UserStats.user_id.in_(user_ids)).delete(synchronize_session=False)
+
+# ===== توابع کمکی =====
+def _bucket_key(moment):
+    """کلید سطل ساعتی یک زمان"""
+    return moment.strftime('%Y-%m-%dT%H')
+
+def _count_due_in_hour(user_id, now):
+    """تعداد کلمات موعد مرور ساعت جاری که next_review آنها تا now رسیده است"""
+    hour_start = now.replace(minute=0, second=0, microsecond=0)
+    return db.session.query(func.count(UserWord.id)).filter(
+        UserWord.user_id == user_id,
+        UserWord.next_review >= hour_start,
+        UserWord.next_review <= now,
+        UserWord.memory_state != 'mastered'
+    ).scalar() or 0
+
+def _load_buckets(stats, now=None):
+    return _fold_buckets(json.loads(stats.due_buckets or '{}'), now or datetime.utcnow())
+
+def _store_buckets(stats, buckets):
+    stats.due_buckets = json.dumps(buckets)
+    stats.updated_at = datetime.utcnow()
+
+def _fold_buckets(buckets, now):
+    """ادغام سطل‌های ساعت‌های گذشته در OVERDUE_BUCKET تا اندازه JSON محدود بماند"""
+    current_hour = _bucket_key(now)
+    folded = {}
+    overdue = buckets.get(OVERDUE_BUCKET, 0)
+    for key, count in buckets.items():
+        if key == OVERDUE_BUCKET:
+            continue
+        if key < current_hour:
+            overdue += count
+        else:
+            folded[key] = count
+    if overdue:
+        folded[OVERDUE_BUCKET] = overdue
+    return folded
+
+def _decrement_bucket(buckets, key):
+    count = buckets.get(key, 0) - 1
+    if count > 0:
+        buckets[key] = count
+    else:
+        buckets.pop(key, None)
+
+def _increment(stats, field, amount):
+    setattr(stats, field, max(0, (getattr(stats, field) or 0) + amount))
+
+def _empty_day():
+    return {'sessions': 0, 'learned': 0, 'reviewed': 0, 'correct': 0, 'questions': 0}
+
+def _record_activity(stats, moment, **amounts):
+    """افزودن به فعالیت روزانه و حذف روزهای قدیمی‌تر از ACTIVITY_DAYS"""
+    activity = json.loads(stats.daily_activity or '{}')
+    day = activity.setdefault(moment.date().isoformat(), _empty_day())
+    for field, amount in amounts.items():
+        day[field] += amount
+    
+    since = (moment - timedelta(days=ACTIVITY_DAYS)).date().isoformat()
+    stats.daily_activity = json.dumps({date: day for date, day in activity.items() if date >= since})
+    stats.updated_at = datetime.utcnow()
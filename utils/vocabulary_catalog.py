@@ -0,0 +1,177 @@
+"""
+کاتالوگ درون‌پروسه‌ای واژگان برای انتخاب گزینه‌های انحرافی بدون کوئری
+"""
+import random
+import threading
+import time
+from collections import namedtuple
+from functools import cached_property
+from sqlalchemy import func
+from models import db, Word, VocabularyFile
+from utils.answer_matching import fold
+
+# تعداد برخورد پیاپی با اندیس تکراری پیش از بر زدن کامل باقی‌مانده استخر
+REJECTION_LIMIT = 8
+
+CatalogWord = namedtuple('CatalogWord', 'id lemma article persian_translation cefr_level part_of_speech')
+
+class VocabularyCatalog:
+    """نمای فقط‌خواندنی از همه کلمات با استخرهای از پیش ساخته شده
+    
+    کلمات بر اساس (cefr_level, part_of_speech, id) مرتب نگهداری می‌شوند،
+    بنابراین هر استخر سطح یا سطح/نقش دستوری یک بازه پیوسته از اندیس‌هاست
+    و نمونه‌گیری با انتخاب اندیس تصادفی در آن بازه انجام می‌شود.
+    """
+    
+    def __init__(self, words=(), fingerprint=None):
+        self.fingerprint = fingerprint
+        self.words = tuple(sorted(words, key=_bucket_order))
+        self._by_id = {word.id: word for word in self.words}
+        
+        pools = {}
+        levels = {}
+        for index, word in enumerate(self.words):
+            for ranges, key in ((pools, (word.cefr_level, word.part_of_speech)), (levels, word.cefr_level)):
+                start = ranges.get(key, (index, index))[0]
+                ranges[key] = (start, index + 1)
+        self._pools = {key: range(*bounds) for key, bounds in pools.items()}
+        self._levels = {key: range(*bounds) for key, bounds in levels.items()}
+    
+    @cached_property
+    def folded_lemmas(self):
+        """مجموعه lemmaهای نرمال‌شده برای رد پاسخ‌هایی که خودشان کلمه دیگری هستند"""
+        return frozenset(fold(word.lemma) for word in self.words)
+    
+    def __len__(self):
+        return len(self.words)
+    
+    def get(self, word_id):
+        """کلمه با شناسه داده‌شده یا None"""
+        return self._by_id.get(word_id)
+    
+    def pool(self, cefr_level, part_of_speech=None):
+        """بازه اندیس کلمات یک سطح (و در صورت نیاز یک نقش دستوری)"""
+        if part_of_speech is None:
+            return self._levels.get(cefr_level, range(0))
+        return self._pools.get((cefr_level, part_of_speech), range(0))
+    
+    @property
+    def all_words(self):
+        """بازه اندیس همه کلمات"""
+        return range(len(self.words))
+    
+    def sample(self, pools, count, exclude_id=None, distinct='persian_translation', exclude_values=()):
+        """انتخاب یکنواخت حداکثر count کلمه، به ترتیب از استخرهای داده‌شده
+        
+        کلمه exclude_id و کلماتی که مقدار فیلد distinct آنها تکراری است یا
+        در exclude_values آمده کنار گذاشته می‌شوند. اگر استخر اول کافی نباشد،
+        کمبود از استخرهای بعدی پر می‌شود. هزینه برای استخرهای بزرگ O(count).
+        """
+        selected = []
+        seen_values = set(exclude_values)
+        tried = set()
+        
+        for pool in pools:
+            if len(selected) >= count:
+                break
+            for index in self._draw(pool, tried):
+                word = self.words[index]
+                value = getattr(word, distinct)
+                if word.id == exclude_id or not value or value in seen_values:
+                    continue
+                seen_values.add(value)
+                selected.append(word)
+                if len(selected) >= count:
+                    break
+        return selected
+    
+    def random_word(self, exclude_id=None):
+        """یک کلمه تصادفی غیر از exclude_id"""
+        if not self.words or (len(self.words) == 1 and self.words[0].id == exclude_id):
+            return None
+        while True:
+            word = random.choice(self.words)
+            if word.id != exclude_id:
+                return word
+    
+    @staticmethod
+    def _draw(pool, tried):
+        """اندیس‌های تصادفی متمایز از بازه pool که قبلاً امتحان نشده‌اند
+        
+        در استخرهای بزرگ اندیس‌ها با نمونه‌گیری ردشونده تولید می‌شوند و
+        فقط به اندازه مصرف هزینه دارند. وقتی بیشتر بازه امتحان شده باشد
+        (یا بازه کوچک باشد) باقی‌مانده بازه به صورت کامل بر زده می‌شود.
+        """
+        size = len(pool)
+        misses = 0
+        while size and misses < REJECTION_LIMIT:
+            index = pool[random.randrange(size)]
+            if index in tried:
+                misses += 1
+                continue
+            misses = 0
+            tried.add(index)
+            yield index
+        
+        rest = [index for index in pool if index not in tried]
+        random.shuffle(rest)
+        for index in rest:
+            tried.add(index)
+            yield index
+
+def _bucket_order(word):
+    """ترتیب کلمات در کاتالوگ؛ مقادیر None جدا از رشته خالی گروه می‌شوند"""
+    return (
+        word.cefr_level is None, word.cefr_level or '',
+        word.part_of_speech is None, word.part_of_speech or '',
+        word.id
+    )
+
+class VocabularyCatalogCache:
+    """نگهداری کاتالوگ فعلی و بارگذاری مجدد آن پس از تغییر واژگان"""
+    
+    def __init__(self, max_age=300):
+        # پس از max_age ثانیه اثر انگشت جدول words بررسی می‌شود تا
+        # تغییرات پروسه‌های دیگر (مثل reset.py) دیده شوند
+        self.max_age = max_age
+        self._catalog = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+    
+    def get(self):
+        """کاتالوگ فعلی؛ در صورت نبود یا تغییر واژگان دوباره ساخته می‌شود"""
+        catalog = self._catalog
+        if catalog is not None and time.monotonic() - self._checked_at < self.max_age:
+            return catalog
+        
+        with self._lock:
+            catalog = self._catalog
+            if catalog is None or time.monotonic() - self._checked_at >= self.max_age:
+                fingerprint = self._fingerprint()
+                if catalog is None or catalog.fingerprint != fingerprint:
+                    catalog = self._catalog = self._load(fingerprint)
+                self._checked_at = time.monotonic()
+        return catalog
+    
+    def invalidate(self):
+        """حذف کاتالوگ تا در دسترسی بعدی دوباره بارگذاری شود"""
+        with self._lock:
+            self._catalog = None
+    
+    @staticmethod
+    def _fingerprint():
+        """خلاصه ارزان از وضعیت واژگان برای تشخیص تغییر"""
+        count, max_id = db.session.query(func.count(Word.id), func.max(Word.id)).one()
+        synced_at = db.session.query(func.max(VocabularyFile.synced_at)).scalar()
+        return count, max_id, synced_at
+    
+    @staticmethod
+    def _load(fingerprint):
+        """خواندن ستون‌های لازم همه کلمات در یک کوئری"""
+        rows = db.session.query(
+            Word.id, Word.lemma, Word.article, Word.persian_translation,
+            Word.cefr_level, Word.part_of_speech
+        ).order_by(Word.id)
+        return VocabularyCatalog((CatalogWord(*row) for row in rows), fingerprint)
+
+vocabulary_catalog = VocabularyCatalogCache()
@@ -1,31 +1,231 @@
+import hashlib
 import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
 from pathlib import Path
-from models import db, Word
+from sqlalchemy import update, delete
+from models import db, Word, UserWord, ReviewLog, VocabularyFile
+from utils.due_queue import due_queues
+from utils.word_counters import word_counters
+from utils.exercise_bank import invalidate_exercises
+from utils.upsert import bulk_insert_ignore
+from utils.user_stats import invalidate_user_stats
+from utils.vocabulary_catalog import vocabulary_catalog
+
+# ترتیب ستون‌ها در تاپل‌هایی که مرحله تجزیه تولید می‌کند
+WORD_COLUMNS = (
+    'lemma', 'article', 'plural', 'part_of_speech', 'cefr_level', 'lesson',
+    'german_definition', 'persian_translation', 'example_german',
+    'example_persian', 'ipa', 'frequency_rank'
+)
+
+# ستون‌های قید یکتای uq_words_lemma_article (همان entry_key)
+WORD_KEY_COLUMNS = ('lemma', 'article')
+
+def parse_vocabulary_file(path):
+    """تجزیه و اعتبارسنجی یک فایل JSON به تاپل‌های ساده
+
+    این تابع به دیتابیس دسترسی ندارد تا بتواند در پروسه‌های جداگانه اجرا شود.
+    خروجی: (نام فایل، لیست تاپل‌ها، لیست خطاهای اعتبارسنجی)
+    """
+    path = Path(path)
+    return parse_vocabulary_data(path.name, path.read_bytes())
+
+def parse_vocabulary_data(name, raw):
+    """تجزیه و اعتبارسنجی محتوای خام یک فایل JSON"""
+    words_data = json.loads(raw)
+    
+    if not isinstance(words_data, list):
+        raise ValueError('ریشه فایل باید یک آرایه باشد')
+    
+    rows = []
+    errors = []
+    for index, word_data in enumerate(words_data):
+        error = _validate_entry(word_data)
+        if error:
+            errors.append({'index': index, 'error': error})
+            continue
+        rows.append(word_values(word_data))
+    
+    return name, rows, errors
+
+def _validate_entry(word_data):
+    """بررسی کلیدهای word، meaning، example و audio یک ورودی"""
+    if not isinstance(word_data, dict):
+        return 'ورودی باید یک شیء باشد'
+    if not isinstance(word_data.get('word'), dict) or not word_data['word'].get('lemma'):
+        return 'کلید word.lemma وجود ندارد'
+    if not isinstance(word_data.get('meaning'), dict):
+        return 'کلید meaning وجود ندارد'
+    for key in ('example', 'audio'):
+        if key in word_data and not isinstance(word_data[key], dict):
+            return f'کلید {key} باید یک شیء باشد'
+    return None
+
+def word_values(word_data):
+    """تبدیل یک ورودی JSON به تاپل مقادیر به ترتیب WORD_COLUMNS"""
+    word = word_data['word']
+    meaning = word_data['meaning']
+    example = word_data.get('example', {})
+    return (
+        word['lemma'],
+        word.get('article') or '',
+        word.get('plural', ''),
+        word.get('part_of_speech', ''),
+        word.get('level', 'A1'),
+        word.get('Lesson', ''),
+        meaning.get('german_definition', ''),
+        meaning.get('persian_translation', ''),
+        example.get('german_sentence', ''),
+        example.get('persian_translation', ''),
+        word_data.get('audio', {}).get('ipa', ''),
+        1000
+    )
+
+# فاصله‌های مجاز بین نشانه‌های JSON
+WHITESPACE = ' \t\r\n'
+
+def iter_json_array(f, read_size=65536):
+    """پیمایش تدریجی عناصر آرایه سطح بالای یک فایل JSON
+
+    به جای json.load کل سند، هر بار فقط یک عنصر در حافظه تجزیه می‌شود.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = f.read(read_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[pos:] + chunk
+        pos = 0
+    
+    def skip(chars):
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in chars:
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            fill()
+    
+    fill()
+    skip(' \t\r\n\ufeff')
+    if pos >= len(buffer) or buffer[pos] != '[':
+        raise ValueError('ریشه فایل باید یک آرایه باشد')
+    pos += 1
+    skip(WHITESPACE)
+    if pos < len(buffer) and buffer[pos] == ']':
+        return
+    
+    while True:
+        skip(WHITESPACE)
+        if pos >= len(buffer):
+            raise ValueError('پایان ناقص آرایه JSON')
+        if buffer[pos] in ',]':
+            # [1,,2]، [,1] یا ویرگول پایانی [1,]
+            raise ValueError('عنصر خالی یا ویرگول اضافه در آرایه JSON')
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+        if not eof and (end == len(buffer) or buffer[end] not in ' \t\r\n,]'):
+            # ممکن است یک عدد در مرز بافر بریده شده باشد
+            fill()
+            continue
+        pos = end
+        yield item
+        
+        # بین دو عنصر دقیقاً یک ویرگول
+        skip(WHITESPACE)
+        if pos >= len(buffer):
+            raise ValueError('پایان ناقص آرایه JSON')
+        if buffer[pos] == ']':
+            return
+        if buffer[pos] != ',':
+            raise ValueError(f"انتظار ',' یا ']' در آرایه JSON، نه {buffer[pos]!r}")
+        pos += 1
+
+def iter_json_lines(f):
+    """پیمایش ورودی‌های یک فایل JSON Lines (هر خط یک شیء)"""
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+def entry_key(values):
+    """کلید یکتای یک کلمه: (lemma, article)"""
+    return values[0], values[1] or ''
 
 class VocabularyLoader:
     """بارگذار خودکار کلمات از فایل‌های JSON"""
     
+    # تعداد سطرها در هر دستور insert گروهی
+    BATCH_SIZE = 500
+    
     def __init__(self, data_folder='data'):
         self.project_root = Path(__file__).parent.parent
         self.data_path = self.project_root / data_folder
     
-    def load_all_files(self):
-        """بارگذاری تمام فایل‌های JSON"""
+    def load_all_files(self, bulk=False, workers=None, streaming=False):
+        """بارگذاری تمام فایل‌های JSON
+
+        با workers فایل‌ها به صورت موازی تجزیه می‌شوند (load_parallel) و
+        با streaming فایل‌های .json و .jsonl به صورت جریانی خوانده می‌شوند.
+        """
         json_files = list(self.data_path.glob('*.json'))
+        if streaming:
+            json_files += list(self.data_path.glob('*.jsonl'))
         
         if not json_files:
             return {'success': False, 'message': 'هیچ فایل JSON یافت نشد'}
         
+        if workers:
+            result = self.load_parallel(json_files, workers)
+        elif streaming:
+            results = [self.load_file_streaming(json_file) for json_file in json_files]
+            result = {
+                'success': True,
+                'mode': 'streaming',
+                'total_added': sum(file_result.get('added', 0) for file_result in results),
+                'files_processed': len(json_files),
+                'details': results
+            }
+        else:
+            result = self._load_files(json_files, bulk)
+        
+        # کاتالوگ گزینه‌های انحرافی پس از commit بارگذاری دوباره ساخته می‌شود؛
+        # باطل کردن پیش از آن به درخواست‌های همزمان اجازه می‌داد نسخه قدیمی را کش کنند
+        vocabulary_catalog.invalidate()
+        return result
+    
+    def _load_files(self, json_files, bulk):
+        """بارگذاری ترتیبی فایل‌ها با ORM یا insert گروهی"""
         results = []
         total_added = 0
         
+        # در حالت گروهی، مجموعه کلمات موجود فقط یک بار خوانده می‌شود
+        existing_lemmas = self._fetch_existing_lemmas() if bulk else None
+        
         for json_file in json_files:
-            result = self.load_file(json_file)
+            if bulk:
+                result = self.bulk_load_file(json_file, existing_lemmas)
+            else:
+                result = self.load_file(json_file)
             results.append(result)
             total_added += result.get('added', 0)
         
         return {
             'success': True,
+            'mode': 'bulk' if bulk else 'orm',
             'total_added': total_added,
             'files_processed': len(json_files),
             'details': results
@@ -44,20 +244,7 @@ class VocabularyLoader:
                 # بررسی وجود کلمه
                 existing = Word.query.filter_by(lemma=word_data['word']['lemma']).first()
                 if not existing:
-                    word = Word(
-                        lemma=word_data['word']['lemma'],
-                        article=word_data['word'].get('article', ''),
-                        plural=word_data['word'].get('plural', ''),
-                        part_of_speech=word_data['word'].get('part_of_speech', ''),
-                        cefr_level=word_data['word'].get('level', 'A1'),
-                        lesson=word_data['word'].get('Lesson', ''),
-                        german_definition=word_data['meaning'].get('german_definition', ''),
-                        persian_translation=word_data['meaning'].get('persian_translation', ''),
-                        example_german=word_data['example'].get('german_sentence', '') if 'example' in word_data else '',
-                        example_persian=word_data['example'].get('persian_translation', '') if 'example' in word_data else '',
-                        ipa=word_data.get('audio', {}).get('ipa', ''),
-                        frequency_rank=1000
-                    )
+                    word = Word(**self._word_row(word_data))
                     db.session.add(word)
                     added_count += 1
                 else:
@@ -79,6 +266,380 @@ class VocabularyLoader:
                 'success': False
             }
     
+    def bulk_load_file(self, json_file, existing_lemmas=None):
+        """بارگذاری گروهی یک فایل با insert چندسطری به جای ORM"""
+        started = time.perf_counter()
+        try:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                words_data = json.load(f)
+            
+            if existing_lemmas is None:
+                existing_lemmas = self._fetch_existing_lemmas()
+            
+            # مقایسه در حافظه با کلمات موجود (و تکراری‌های همین فایل)
+            rows = []
+            skipped_count = 0
+            for word_data in words_data:
+                row = self._word_row(word_data)
+                if row['lemma'] in existing_lemmas:
+                    skipped_count += 1
+                    continue
+                existing_lemmas.add(row['lemma'])
+                rows.append(row)
+            
+            added_count = bulk_insert_ignore(Word, rows, WORD_KEY_COLUMNS, self.BATCH_SIZE)
+            db.session.commit()
+            
+            elapsed = time.perf_counter() - started
+            return {
+                'file': json_file.name,
+                'added': added_count,
+                'skipped': skipped_count + len(rows) - added_count,
+                'elapsed': round(elapsed, 4),
+                'rows_per_sec': round(len(words_data) / elapsed) if elapsed > 0 else None,
+                'success': True
+            }
+            
+        except Exception as e:
+            db.session.rollback()
+            return {
+                'file': json_file.name,
+                'error': str(e),
+                'success': False
+            }
+    
+    def load_parallel(self, json_files, workers=None):
+        """خط لوله دو مرحله‌ای: تجزیه موازی در پروسه‌ها و یک نویسنده واحد
+
+        مرحله اول فایل‌ها را در ProcessPoolExecutor به تاپل تبدیل می‌کند؛
+        مرحله دوم به محض آماده شدن هر فایل، سطرهای آن را در همین
+        پروسه (که session دیتابیس را در اختیار دارد) درج می‌کند.
+        """
+        started = time.perf_counter()
+        workers = min(workers or os.cpu_count() or 1, len(json_files))
+        existing_lemmas = self._fetch_existing_lemmas()
+        
+        results = []
+        total_added = 0
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(parse_vocabulary_file, path): path for path in json_files}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    file_name, rows, errors = future.result()
+                except Exception as e:
+                    results.append({'file': path.name, 'error': str(e), 'success': False})
+                    continue
+                
+                result = self._write_rows(file_name, rows, existing_lemmas)
+                result['invalid'] = len(errors)
+                if errors:
+                    result['validation_errors'] = errors[:10]
+                results.append(result)
+                total_added += result.get('added', 0)
+        
+        return {
+            'success': True,
+            'mode': 'parallel',
+            'workers': workers,
+            'total_added': total_added,
+            'files_processed': len(json_files),
+            'elapsed': round(time.perf_counter() - started, 4),
+            'details': results
+        }
+    
+    def sync_all_files(self):
+        """همگام‌سازی افزایشی فایل‌ها با دیتابیس بر اساس مانیفست
+
+        فایل‌هایی که mtime و اندازه (یا هش محتوا) آنها تغییر نکرده خوانده
+        نمی‌شوند. برای فایل‌های تغییر کرده، سطرها بر اساس (lemma, article)
+        درج، بروزرسانی یا حذف می‌شوند. فایلی که از پوشه data برداشته شده فقط
+        از مانیفست حذف می‌شود و کلماتش (همراه با پیشرفت کاربران) می‌مانند.
+        """
+        started = time.perf_counter()
+        manifest = {entry.path: entry for entry in VocabularyFile.query.all()}
+        json_files = sorted(self.data_path.glob('*.json'))
+        
+        results = []
+        totals = {'inserted': 0, 'updated': 0, 'deleted': 0}
+        unchanged = 0
+        seen_paths = set()
+        
+        try:
+            # مرحله اول: تجزیه همه فایل‌های تغییر کرده پیش از هر حذف
+            changed = []
+            for json_file in json_files:
+                rel_path = json_file.relative_to(self.project_root).as_posix()
+                seen_paths.add(rel_path)
+                entry = manifest.get(rel_path)
+                stat = json_file.stat()
+                
+                if entry and entry.mtime == stat.st_mtime and entry.size == stat.st_size:
+                    unchanged += 1
+                    continue
+                
+                raw = json_file.read_bytes()
+                content_hash = hashlib.sha256(raw).hexdigest()
+                if entry and entry.content_hash == content_hash:
+                    # فقط زمان فایل عوض شده
+                    entry.mtime = stat.st_mtime
+                    entry.size = stat.st_size
+                    unchanged += 1
+                    continue
+                
+                _, rows, errors = parse_vocabulary_data(json_file.name, raw)
+                changed.append((json_file, rel_path, entry, stat, content_hash, rows, errors))
+            
+            # کلیدهایی که اکنون در هر فایلی وجود دارند، به‌علاوه کلیدهای فایل‌های برداشته‌شده
+            # که نگه داشته می‌شوند؛ فقط کلیدهای خارج از این مجموعه حذف می‌شوند
+            changed_paths = {item[1] for item in changed}
+            current_keys = set()
+            for rel_path, entry in manifest.items():
+                if rel_path not in changed_paths:
+                    current_keys.update(tuple(key) for key in json.loads(entry.entry_keys or '[]'))
+            for item in changed:
+                current_keys.update(entry_key(values) for values in item[5])
+            
+            # مرحله دوم: اعمال تغییرات هر فایل
+            for json_file, rel_path, entry, stat, content_hash, rows, errors in changed:
+                if entry is None:
+                    entry = VocabularyFile(path=rel_path)
+                    db.session.add(entry)
+                
+                result = self._sync_rows(json_file.name, rows, entry, current_keys)
+                result['invalid'] = len(errors)
+                results.append(result)
+                for key in totals:
+                    totals[key] += result[key]
+                
+                entry.mtime = stat.st_mtime
+                entry.size = stat.st_size
+                entry.content_hash = content_hash
+                entry.synced_at = datetime.utcnow()
+            
+            # فایل‌هایی که از پوشه data حذف شده‌اند: کلماتشان حذف نمی‌شود
+            for rel_path, entry in manifest.items():
+                if rel_path in seen_paths:
+                    continue
+                results.append({
+                    'file': Path(rel_path).name,
+                    'inserted': 0,
+                    'updated': 0,
+                    'deleted': 0,
+                    'removed': True,
+                    'success': True
+                })
+                db.session.delete(entry)
+            
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return {'success': False, 'error': str(e)}
+        
+        if results:
+            vocabulary_catalog.invalidate()
+        
+        return {
+            'success': True,
+            'mode': 'sync',
+            'files_unchanged': unchanged,
+            'files_synced': len(results),
+            'elapsed': round(time.perf_counter() - started, 4),
+            'details': results,
+            **totals
+        }
+    
+    def _sync_rows(self, file_name, rows, entry, current_keys):
+        """اعمال تفاوت سطری یک فایل تغییر کرده روی جدول words
+
+        current_keys کلیدهای همه فایل‌ها در وضعیت فعلی است؛ کلیدی که به
+        فایل دیگری منتقل شده حذف نمی‌شود تا شناسه و UserWordهای آن بمانند.
+        """
+        new_rows = {entry_key(values): values for values in rows}
+        old_keys = {tuple(key) for key in json.loads(entry.entry_keys or '[]')}
+        removed_keys = old_keys - set(new_rows) - current_keys
+        
+        existing = self._fetch_words_by_key({key[0] for key in new_rows} | {key[0] for key in removed_keys})
+        
+        inserts = []
+        updates = []
+        for key, values in new_rows.items():
+            current = existing.get(key)
+            if current is None:
+                inserts.append(dict(zip(WORD_COLUMNS, values)))
+            elif current[1] != values:
+                updates.append({'id': current[0], **dict(zip(WORD_COLUMNS, values))})
+        
+        bulk_insert_ignore(Word, inserts, WORD_KEY_COLUMNS, self.BATCH_SIZE)
+        for start in range(0, len(updates), self.BATCH_SIZE):
+            chunk = updates[start:start + self.BATCH_SIZE]
+            db.session.execute(update(Word), chunk)
+            # تمرین‌های ذخیره‌شده کلمه تغییر کرده دیگر معتبر نیستند
+            invalidate_exercises([row['id'] for row in chunk])
+        
+        removed_ids = [existing[key][0] for key in removed_keys if key in existing]
+        if removed_ids:
+            self._delete_words(removed_ids)
+        
+        entry.entry_keys = json.dumps(sorted(new_rows), ensure_ascii=False)
+        
+        return {
+            'file': file_name,
+            'inserted': len(inserts),
+            'updated': len(updates),
+            'deleted': len(removed_ids),
+            'success': True
+        }
+    
+    def _fetch_words_by_key(self, lemmas):
+        """نگاشت (lemma, article) به (id، تاپل مقادیر) برای lemmaهای داده‌شده"""
+        columns = [Word.id] + [getattr(Word, name) for name in WORD_COLUMNS]
+        lemmas = list(lemmas)
+        existing = {}
+        for start in range(0, len(lemmas), self.BATCH_SIZE):
+            chunk = lemmas[start:start + self.BATCH_SIZE]
+            for row in db.session.query(*columns).filter(Word.lemma.in_(chunk)).order_by(Word.id):
+                values = tuple(row[1:])
+                existing.setdefault(entry_key(values), (row[0], values))
+        return existing
+    
+    def _delete_words(self, word_ids):
+        """حذف کلمات همراه با وضعیت کاربران و لاگ‌های مرتبط"""
+        for start in range(0, len(word_ids), self.BATCH_SIZE):
+            chunk = word_ids[start:start + self.BATCH_SIZE]
+            user_word_ids = db.session.query(UserWord.id).filter(UserWord.word_id.in_(chunk))
+            # آمار کاربرانی که این کلمات را داشته‌اند دوباره ساخته می‌شود
+            invalidate_user_stats(db.session.query(UserWord.user_id).filter(UserWord.word_id.in_(chunk)))
+            db.session.execute(delete(ReviewLog).where(ReviewLog.user_word_id.in_(user_word_ids)))
+            db.session.execute(delete(UserWord).where(UserWord.word_id.in_(chunk)))
+            invalidate_exercises(chunk)
+            db.session.execute(delete(Word).where(Word.id.in_(chunk)))
+        due_queues.invalidate()
+        word_counters.invalidate()
+    
+    def _write_rows(self, file_name, rows, existing_lemmas):
+        """مرحله نویسنده: درج گروهی تاپل‌های تجزیه‌شده یک فایل"""
+        started = time.perf_counter()
+        try:
+            new_rows = []
+            skipped_count = 0
+            for values in rows:
+                if values[0] in existing_lemmas:
+                    skipped_count += 1
+                    continue
+                existing_lemmas.add(values[0])
+                new_rows.append(dict(zip(WORD_COLUMNS, values)))
+            
+            added_count = bulk_insert_ignore(Word, new_rows, WORD_KEY_COLUMNS, self.BATCH_SIZE)
+            db.session.commit()
+            
+            elapsed = time.perf_counter() - started
+            return {
+                'file': file_name,
+                'added': added_count,
+                'skipped': skipped_count + len(new_rows) - added_count,
+                'elapsed': round(elapsed, 4),
+                'rows_per_sec': round(len(rows) / elapsed) if elapsed > 0 else None,
+                'success': True
+            }
+            
+        except Exception as e:
+            db.session.rollback()
+            return {
+                'file': file_name,
+                'error': str(e),
+                'success': False
+            }
+    
+    def load_file_streaming(self, json_file, chunk_size=None):
+        """بارگذاری جریانی یک فایل بزرگ با commit در بسته‌های محدود
+
+        عناصر یکی‌یکی تجزیه می‌شوند و وجود کلمات برای هر بسته با یک کوئری
+        بررسی می‌شود، بنابراین حافظه مصرفی به اندازه فایل بستگی ندارد.
+        فایل‌های با پسوند .jsonl به صورت JSON Lines خوانده می‌شوند.
+        """
+        json_file = Path(json_file)
+        chunk_size = chunk_size or self.BATCH_SIZE
+        started = time.perf_counter()
+        added_count = 0
+        skipped_count = 0
+        invalid_count = 0
+        chunks = 0
+        
+        try:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                if json_file.suffix == '.jsonl':
+                    entries = iter_json_lines(f)
+                else:
+                    entries = iter_json_array(f)
+                
+                chunk = []
+                for word_data in entries:
+                    if _validate_entry(word_data):
+                        invalid_count += 1
+                        continue
+                    chunk.append(word_values(word_data))
+                    if len(chunk) >= chunk_size:
+                        added, skipped = self._write_chunk(chunk)
+                        added_count += added
+                        skipped_count += skipped
+                        chunks += 1
+                        chunk = []
+                if chunk:
+                    added, skipped = self._write_chunk(chunk)
+                    added_count += added
+                    skipped_count += skipped
+                    chunks += 1
+            
+            elapsed = time.perf_counter() - started
+            total = added_count + skipped_count
+            return {
+                'file': json_file.name,
+                'added': added_count,
+                'skipped': skipped_count,
+                'invalid': invalid_count,
+                'chunks': chunks,
+                'elapsed': round(elapsed, 4),
+                'rows_per_sec': round(total / elapsed) if elapsed > 0 else None,
+                'success': True
+            }
+            
+        except Exception as e:
+            db.session.rollback()
+            return {
+                'file': json_file.name,
+                'added': added_count,
+                'error': str(e),
+                'success': False
+            }
+    
+    def _write_chunk(self, chunk):
+        """درج و commit یک بسته از جریان ورودی؛ خروجی: (درج‌شده، ردشده)"""
+        lemmas = {values[0] for values in chunk}
+        existing = {lemma for (lemma,) in db.session.query(Word.lemma).filter(Word.lemma.in_(lemmas))}
+        
+        rows = []
+        for values in chunk:
+            if values[0] in existing:
+                continue
+            existing.add(values[0])
+            rows.append(dict(zip(WORD_COLUMNS, values)))
+        
+        added = bulk_insert_ignore(Word, rows, WORD_KEY_COLUMNS)
+        db.session.commit()
+        return added, len(chunk) - added
+    
+    @staticmethod
+    def _fetch_existing_lemmas():
+        """مجموعه lemmaهای موجود در دیتابیس با یک کوئری"""
+        return {lemma for (lemma,) in db.session.query(Word.lemma)}
+    
+    @staticmethod
+    def _word_row(word_data):
+        """تبدیل یک ورودی JSON به ستون‌های مدل Word"""
+        return dict(zip(WORD_COLUMNS, word_values(word_data)))
+    
     def get_stats(self):
         """دریافت آمار کلمات"""
         total_words = Word.query.count()
@@ -105,8 +666,12 @@ class VocabularyLoader:
     def clear_database(self):
         """پاک کردن تمام کلمات (برای تست)"""
         try:
+            invalidate_exercises()
             deleted_count = Word.query.delete()
             db.session.commit()
+            due_queues.invalidate()
+            word_counters.invalidate()
+            vocabulary_catalog.invalidate()
             return {'success': True, 'deleted': deleted_count}
         except Exception as e:
             db.session.rollback()
@@ -0,0 +1,67 @@
+"""
+شمارنده‌های درون‌پروسه‌ای وضعیت کلمات هر کاربر فعال
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+
+class WordCounterRegistry:
+    """تعداد UserWordهای هر کاربر به تفکیک memory_state با حذف LRU
+    
+    شمارنده‌ها هنگام ایجاد UserWord و تغییر وضعیت در calculate_review به صورت
+    افزایشی بروز می‌شوند و پس از max_age ثانیه دوباره از دیتابیس خوانده
+    می‌شوند تا تغییرات پروسه‌های دیگر یا تراکنش‌های برگشت‌خورده اصلاح شوند.
+    """
+    
+    def __init__(self, max_users=5000, max_age=300):
+        self.max_users = max_users
+        self.max_age = max_age
+        self._counters = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, user_id, loader):
+        """کپی شمارنده‌های کاربر؛ در صورت نبود یا قدیمی بودن با loader(user_id) خوانده می‌شود
+        
+        loader باید نگاشت memory_state به تعداد را برگرداند.
+        """
+        with self._lock:
+            item = self._counters.get(user_id)
+            if item and time.monotonic() - item[1] < self.max_age:
+                self._counters.move_to_end(user_id)
+                return Counter(item[0])
+        
+        counts = Counter(loader(user_id))
+        with self._lock:
+            self._counters[user_id] = (counts, time.monotonic())
+            self._counters.move_to_end(user_id)
+            while len(self._counters) > self.max_users:
+                self._counters.popitem(last=False)
+        return Counter(counts)
+    
+    def record_created(self, user_id, state='new', count=1):
+        """ثبت UserWordهای تازه ایجادشده (اگر شمارنده کاربر بارگذاری شده باشد)"""
+        with self._lock:
+            item = self._counters.get(user_id)
+            if item:
+                item[0][state] += count
+    
+    def record_transition(self, user_id, old_state, new_state):
+        """ثبت تغییر وضعیت یک UserWord"""
+        if old_state == new_state:
+            return
+        with self._lock:
+            item = self._counters.get(user_id)
+            if item:
+                counts = item[0]
+                counts[old_state] = max(0, counts[old_state] - 1)
+                counts[new_state] += 1
+    
+    def invalidate(self, user_id=None):
+        """حذف شمارنده‌های یک کاربر یا همه کاربران"""
+        with self._lock:
+            if user_id is None:
+                self._counters.clear()
+            else:
+                self._counters.pop(user_id, None)
+
+word_counters = WordCounterRegistry()